@@ -1,14 +1,20 @@
 from .nodes.LoadImagesFromDirectory import LoadImagesFromDirectory
+from .nodes.LoadKeyframeStream import LoadKeyframeStream
 from .nodes.WanKeyframeToVideo import WanKeyframeToVideo
+from .nodes.WanKeyframeToVideoSegments import WanKeyframeToVideoSegments
 
 NODE_CLASS_MAPPINGS = {
     "LoadImagesFromDirectory": LoadImagesFromDirectory,
+    "LoadKeyframeStream": LoadKeyframeStream,
     "WanKeyframeToVideo": WanKeyframeToVideo,
+    "WanKeyframeToVideoSegments": WanKeyframeToVideoSegments,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
     "LoadImagesFromDirectory": "Load Images From Directory",
+    "LoadKeyframeStream": "Load Keyframe Stream",
     "WanKeyframeToVideo": "Wan Keyframe To Video",
+    "WanKeyframeToVideoSegments": "Wan Keyframe To Video (Segments)",
 }
 
 __all__ = [
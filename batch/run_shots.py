@@ -0,0 +1,344 @@
+"""
+Headless batch encoding of many shots with LoadImagesFromDirectory and
+WanKeyframeToVideo, outside the ComfyUI queue.
+
+Reads a manifest of shots (a keyframe directory plus a prompt file each), loads
+one CLIP text encoder and one VAE for the whole run, loads the keyframes of
+upcoming shots on a worker pool while the current shot is encoded, and writes
+each shot's conditioning to <output>/<shot>.safetensors for later sampling.
+Shots whose output is up to date are skipped, so an interrupted run resumes
+where it stopped:
+
+    python batch/run_shots.py episode.json --output encoded \\
+        --clip umt5_xxl_fp8_e4m3fn_scaled.safetensors --vae wan_2.1_vae.safetensors
+
+Run it with the Python environment of the ComfyUI install the extension lives
+in. The exit code is 1 when a shot failed.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import importlib.util
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import load_file, save_file
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "wankeyframing"
+# Written to every output file; bump when the stored tensors change
+OUTPUT_FORMAT = "wankeyframing.shot/1"
+
+SHOT_DEFAULTS = {
+    "negative_prompt": "low quality, blurry, bad lighting",
+    "width": 496,
+    "height": 496,
+    "fps": 16,
+    "seconds": 1,
+    # Every shot is loaded once, so the decoded keyframe cache would only hold memory
+    "loader": {"resize_mode": "crop", "sort_mode": "name_asc", "cache_mode": "disabled"},
+    # Every shot is encoded once, so cached segment latents would never be reused
+    "encoder": {"reuse_segments": False},
+}
+
+
+def merge_settings(base, override):
+    """
+    Shallow merge of two settings dicts; "loader" and "encoder" dicts are merged key by key.
+    """
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = {**merged[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_manifest(path):
+    """
+    Read a manifest and return its shots with the defaults applied, keyframe
+    paths made absolute (relative to the manifest) and prompt files read.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if isinstance(manifest, list):
+        manifest = {"shots": manifest}
+    base_dir = os.path.dirname(os.path.abspath(path))
+    defaults = merge_settings(SHOT_DEFAULTS, manifest.get("defaults", {}))
+
+    shots = []
+    names = set()
+    for number, entry in enumerate(manifest.get("shots", [])):
+        if "keyframes" not in entry or ("prompts" not in entry and "positive_prompt" not in entry):
+            raise ValueError(f"Shot {number} needs 'keyframes' and 'prompts' (or 'positive_prompt')")
+        shot = merge_settings(defaults, entry)
+        shot["keyframes"] = os.path.join(base_dir, shot["keyframes"])
+        name = shot.setdefault("name", os.path.splitext(os.path.basename(os.path.normpath(shot["keyframes"])))[0])
+        if not name or os.path.basename(name) != name:
+            raise ValueError(f"Invalid shot name: '{name}'")
+        if name in names:
+            raise ValueError(f"Duplicate shot name: '{name}'")
+        names.add(name)
+        if "prompts" in entry:
+            with open(os.path.join(base_dir, entry["prompts"]), "r", encoding="utf-8") as f:
+                shot["positive_prompt"] = f.read()
+        shots.append(shot)
+
+    if not shots:
+        raise ValueError(f"No shots in manifest: {path}")
+    return shots
+
+
+def shot_fingerprint(loader, shot, models):
+    """
+    Hash of everything a shot's output depends on: its settings and prompts, the
+    model names and the (name, mtime, size) fingerprint of its keyframe files.
+    """
+    loader_args = shot["loader"]
+    file_paths, stats = loader.resolve_files(
+        shot["keyframes"], loader_args.get("sort_mode", "name_asc"),
+        loader_args.get("pattern", "*"), loader_args.get("index_range", "")
+    )
+    h = hashlib.sha1()
+    h.update(json.dumps({"shot": shot, "models": models}, sort_keys=True).encode("utf-8"))
+    h.update(loader.directory_fingerprint(file_paths, stats).encode("utf-8"))
+    return h.hexdigest()
+
+
+def is_done(path, fingerprint):
+    """
+    True when path holds the output of a previous run with the same fingerprint.
+    """
+    if not os.path.exists(path):
+        return False
+    try:
+        with safe_open(path, framework="pt") as f:
+            metadata = f.metadata() or {}
+    except Exception:
+        return False
+    return metadata.get("format") == OUTPUT_FORMAT and metadata.get("fingerprint") == fingerprint
+
+
+def load_keyframes(loader, shot):
+    """
+    Keyframe batch of a shot, resized to the shot's video size.
+    """
+    loader_args = dict(shot["loader"])
+    resize_mode = loader_args.pop("resize_mode", "crop")
+    sort_mode = loader_args.pop("sort_mode", "name_asc")
+    images, _ = loader.load_images(
+        shot["keyframes"], False, shot["width"], shot["height"], resize_mode, sort_mode, **loader_args
+    )
+    return images
+
+
+def encode_shot(encoder, clip, vae, shot, keyframes):
+    """
+    Run WanKeyframeToVideo on one shot. Returns (tensors, latent_shape): the
+    conditioning tensors to store, each once, and the shape of the empty latent.
+    """
+    positive, negative, latent, _ = encoder.encode(
+        clip, shot["positive_prompt"], shot["negative_prompt"], vae,
+        shot["width"], shot["height"], shot["fps"], shot["seconds"], keyframes=keyframes, **shot["encoder"]
+    )
+    tensors = {}
+    for prefix, conditioning in (("positive", positive), ("negative", negative)):
+        embedding, extras = conditioning[0]
+        tensors[prefix] = embedding
+        if extras.get("pooled_output") is not None:
+            tensors[f"{prefix}_pooled"] = extras["pooled_output"]
+    # Positive and negative reference the same concat latents and masks
+    shared = positive[0][1]
+    for key in ("concat_latent_image", "concat_mask"):
+        if key in shared:
+            tensors[key] = shared[key]
+    tensors = {key: value.detach().cpu().contiguous() for key, value in tensors.items()}
+    return tensors, list(latent["samples"].shape)
+
+
+def save_shot(path, tensors, metadata):
+    """
+    Write a shot's tensors atomically, so an interrupted run never leaves a partial file.
+    """
+    temp_path = f"{path}.tmp"
+    save_file(tensors, temp_path, metadata=metadata)
+    os.replace(temp_path, path)
+
+
+def load_shot(path):
+    """
+    Read a file written by this script back into the (positive, negative, latent)
+    values WanKeyframeToVideo returns.
+    """
+    tensors = load_file(path)
+    with safe_open(path, framework="pt") as f:
+        metadata = f.metadata()
+    shared = {key: tensors[key] for key in ("concat_latent_image", "concat_mask") if key in tensors}
+
+    def conditioning(prefix):
+        extras = dict(shared)
+        if f"{prefix}_pooled" in tensors:
+            extras["pooled_output"] = tensors[f"{prefix}_pooled"]
+        return [[tensors[prefix], extras]]
+
+    latent = torch.zeros(json.loads(metadata["latent_shape"]))
+    return conditioning("positive"), conditioning("negative"), {"samples": latent}
+
+
+def setup_comfyui(comfyui_root, extra_model_paths_configs=()):
+    """
+    Make the ComfyUI install at comfyui_root importable and return its nodes module.
+    Model folders from its extra_model_paths.yaml and from extra_model_paths_configs
+    are registered the way ComfyUI does at startup.
+    """
+    if not os.path.isfile(os.path.join(comfyui_root, "folder_paths.py")):
+        raise FileNotFoundError(f"ComfyUI not found at: {comfyui_root} (use --comfyui)")
+    sys.path.insert(0, comfyui_root)
+    load_extra_model_paths(comfyui_root, extra_model_paths_configs)
+    import nodes
+    return nodes
+
+
+def load_extra_model_paths(comfyui_root, config_paths=()):
+    """
+    Load extra_model_paths.yaml of the ComfyUI root (when present) and any further
+    config files with ComfyUI's own loader, so models in shared folders are found.
+    """
+    default_path = os.path.join(comfyui_root, "extra_model_paths.yaml")
+    config_paths = ([default_path] if os.path.isfile(default_path) else []) + list(config_paths)
+    if not config_paths:
+        return
+    try:
+        from utils.extra_config import load_extra_path_config
+    except ImportError:
+        print("Warning: This ComfyUI version has no utils.extra_config; extra model paths are not loaded")
+        return
+    for config_path in config_paths:
+        load_extra_path_config(config_path)
+
+
+def load_package():
+    """
+    Import this repository as a package (the way ComfyUI imports custom nodes).
+    """
+    if PACKAGE_NAME in sys.modules:
+        return sys.modules[PACKAGE_NAME]
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_ROOT, "__init__.py"), submodule_search_locations=[PACKAGE_ROOT]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+def run(args):
+    comfy_nodes = setup_comfyui(args.comfyui, args.extra_model_paths_config)
+    package = load_package()
+    loader = package.nodes.LoadImagesFromDirectory.LoadImagesFromDirectory()
+    encoder = package.nodes.WanKeyframeToVideo.WanKeyframeToVideo()
+    shots = load_manifest(args.manifest)
+    os.makedirs(args.output, exist_ok=True)
+
+    # Resume: skip shots whose output matches their current settings and keyframes
+    models = {"clip": args.clip, "clip_type": args.clip_type, "vae": args.vae}
+    failed = []
+    jobs = []
+    for shot in shots:
+        path = os.path.join(args.output, f"{shot['name']}.safetensors")
+        try:
+            fingerprint = shot_fingerprint(loader, shot, models)
+        except Exception as e:
+            print(f"[run_shots] Shot {shot['name']} failed: {e}")
+            failed.append(shot["name"])
+            continue
+        if args.force or not is_done(path, fingerprint):
+            jobs.append((shot, path, fingerprint))
+    print(f"[run_shots] {len(jobs)} of {len(shots)} shots to encode, {len(shots) - len(jobs) - len(failed)} up to date")
+
+    if jobs:
+        # One CLIP and one VAE for the whole run; the text and segment caches persist across shots
+        clip = comfy_nodes.CLIPLoader().load_clip(args.clip, type=args.clip_type)[0]
+        vae = comfy_nodes.VAELoader().load_vae(args.vae)[0]
+
+        started = time.perf_counter()
+        encoded = 0
+        processed = 0
+        pool = ThreadPoolExecutor(max_workers=args.load_workers, thread_name_prefix="run_shots")
+        try:
+            # Keyframes of the next prefetch_shots shots load while the current one encodes
+            upcoming = iter(jobs)
+            pending = deque()
+
+            def submit_next():
+                job = next(upcoming, None)
+                if job is not None:
+                    pending.append((job, pool.submit(load_keyframes, loader, job[0])))
+
+            for _ in range(args.prefetch_shots + 1):
+                submit_next()
+            while pending:
+                (shot, path, fingerprint), future = pending.popleft()
+                submit_next()
+                processed += 1
+                shot_started = time.perf_counter()
+                try:
+                    keyframes = future.result()
+                    tensors, latent_shape = encode_shot(encoder, clip, vae, shot, keyframes)
+                    del keyframes
+                    save_shot(path, tensors, {
+                        "format": OUTPUT_FORMAT,
+                        "fingerprint": fingerprint,
+                        "shot": shot["name"],
+                        "latent_shape": json.dumps(latent_shape),
+                        "settings": json.dumps({key: value for key, value in shot.items() if key != "positive_prompt"}),
+                        "positive_prompt": shot["positive_prompt"],
+                    })
+                except Exception as e:
+                    print(f"[run_shots] Shot {shot['name']} failed: {e}")
+                    failed.append(shot["name"])
+                    continue
+                encoded += 1
+                print(
+                    f"[run_shots] {shot['name']}: {latent_shape[0]} segments in "
+                    f"{time.perf_counter() - shot_started:.1f}s ({processed}/{len(jobs)})"
+                )
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        print(f"[run_shots] Encoded {encoded} shots in {elapsed:.1f}s ({encoded * 60 / max(elapsed, 1e-9):.1f} shots/min)")
+
+    if failed:
+        print(f"[run_shots] {len(failed)} shots failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSON manifest of shots")
+    parser.add_argument("--output", required=True, help="Directory for the per-shot .safetensors files")
+    parser.add_argument("--clip", required=True, help="Text encoder file name in ComfyUI's text_encoders folder")
+    parser.add_argument("--clip-type", default="wan", help="CLIPLoader type")
+    parser.add_argument("--vae", required=True, help="VAE file name in ComfyUI's vae folder")
+    parser.add_argument("--comfyui", default=os.path.dirname(os.path.dirname(PACKAGE_ROOT)),
+                        help="ComfyUI root (default: two levels above this extension)")
+    parser.add_argument("--extra-model-paths-config", action="append", default=[],
+                        help="Further extra_model_paths.yaml style config to load (repeatable); "
+                             "the one in the ComfyUI root is always loaded")
+    parser.add_argument("--prefetch-shots", type=int, default=2, help="Shots loaded ahead of the one being encoded")
+    parser.add_argument("--load-workers", type=int, default=2, help="Shots loaded concurrently")
+    parser.add_argument("--force", action="store_true", help="Encode every shot, even when its output is up to date")
+    args = parser.parse_args(argv)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Measure how far filler_mode="cached" concat latents are from filler_mode="full".
+
+Encodes the same segments in both modes with a real VAE and reports the mean
+and max absolute latent difference per region: the start keyframe and the
+filler_context latent frames after it, the remaining filler frames, and the end
+keyframe frame. With a filler_context that covers the encoder's temporal
+receptive field (the default) all differences are expected to be 0. Run it with
+the Python environment of a ComfyUI install:
+
+    python benchmarks/filler_tolerance.py --vae wan_2.1_vae.safetensors
+    python benchmarks/filler_tolerance.py --vae wan_2.1_vae.safetensors --keyframes /path/to/keyframes
+
+--stub uses the stub VAE of stubs.py instead, as a smoke test without ComfyUI.
+"""
+import os
+import sys
+import json
+import argparse
+
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stubs  # noqa: E402
+
+
+def synthetic_keyframes(count, width, height):
+    """
+    Smooth color gradients with a moving bright square, in 0..1.
+    """
+    y, x = torch.meshgrid(torch.linspace(0, 1, height), torch.linspace(0, 1, width), indexing="ij")
+    frames = []
+    for i in range(count):
+        phase = i / max(1, count - 1)
+        frame = torch.stack([x * (1 - phase) + phase * y, y, (x + y + phase) % 1.0], dim=-1)
+        size = min(width, height) // 4
+        left = int((width - size) * phase)
+        top = (height - size) // 2
+        frame[top:top + size, left:left + size] = 1.0
+        frames.append(frame)
+    return torch.stack(frames)
+
+
+def region_stats(full, cached, filler_context):
+    """
+    Mean and max absolute difference of two segment latents [1, C, T, h, w] per region.
+    """
+    latent_frames = full.shape[2]
+    regions = {
+        "head": slice(0, filler_context + 1),
+        "filler": slice(filler_context + 1, latent_frames - 1),
+        "end": slice(latent_frames - 1, latent_frames),
+        "all": slice(0, latent_frames),
+    }
+    stats = {}
+    for name, frames in regions.items():
+        diff = (full[:, :, frames].float() - cached[:, :, frames].float()).abs()
+        if diff.numel() == 0:
+            continue
+        stats[name] = {"mean": diff.mean().item(), "max": diff.max().item()}
+    stats["latent_std"] = full.float().std().item()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vae", help="VAE file name in ComfyUI's vae folder")
+    parser.add_argument("--comfyui", default=os.path.dirname(os.path.dirname(stubs.PACKAGE_ROOT)),
+                        help="ComfyUI root (default: two levels above this extension)")
+    parser.add_argument("--stub", action="store_true", help="Use the stub VAE instead of ComfyUI")
+    parser.add_argument("--keyframes", help="Keyframe directory (default: synthetic keyframes)")
+    parser.add_argument("--segments", type=int, default=4)
+    parser.add_argument("--size", default="496x496", help="width x height")
+    parser.add_argument("--fps", type=int, default=16)
+    parser.add_argument("--seconds", type=int, default=15)
+    parser.add_argument("--filler-context", type=int, help="Latent frames of context (default: the node default)")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+    width, height = (int(value) for value in args.size.lower().split("x"))
+
+    if args.stub:
+        stubs.install_stubs(os.getcwd())
+        vae = stubs.StubVAE()
+    else:
+        if not args.vae:
+            parser.error("--vae is required unless --stub is given")
+        if not os.path.isfile(os.path.join(args.comfyui, "folder_paths.py")):
+            parser.error(f"ComfyUI not found at: {args.comfyui} (use --comfyui)")
+        sys.path.insert(0, args.comfyui)
+        import nodes
+        vae = nodes.VAELoader().load_vae(args.vae)[0]
+    package = stubs.load_package()
+    encoder = package.nodes.WanKeyframeToVideo.WanKeyframeToVideo()
+    # encode_segments raises the context to the receptive field; report regions for the context it uses
+    filler_context = max(args.filler_context or 0, package.nodes.WanKeyframeToVideo.CAUSAL_ENCODER_CONTEXT)
+
+    if args.keyframes:
+        loader = package.nodes.LoadImagesFromDirectory.LoadImagesFromDirectory()
+        keyframes, _ = loader.load_images(
+            os.path.abspath(args.keyframes), False, width, height, "crop", "name_asc",
+            index_range=f":{args.segments + 1}", cache_mode="disabled"
+        )
+    else:
+        keyframes = synthetic_keyframes(args.segments + 1, width, height)
+    segments = list(range(keyframes.shape[0] - 1))
+    frames = dict(enumerate(keyframes))
+    length = encoder.segment_length(args.fps, args.seconds)
+    if (length - 1) // 4 + 1 <= 2 * filler_context + 1:
+        parser.error("Segments this short are always encoded in full; raise --seconds")
+
+    latents = {}
+    for mode in ("full", "cached"):
+        latents[mode] = encoder.encode_segments(
+            vae, frames, segments, length, width, height, filler_mode=mode, filler_context=filler_context
+        )
+
+    results = [region_stats(full, cached, filler_context) for full, cached in zip(latents["full"], latents["cached"])]
+    summary = {}
+    for region in ("head", "filler", "end", "all"):
+        values = [result[region] for result in results if region in result]
+        if values:
+            summary[region] = {
+                "mean": sum(value["mean"] for value in values) / len(values),
+                "max": max(value["max"] for value in values),
+            }
+    summary["latent_std"] = sum(result["latent_std"] for result in results) / len(results)
+
+    print(f"{len(segments)} segments, {length} frames at {width}x{height}, filler_context={filler_context}")
+    print(f"Latent standard deviation (full mode): {summary['latent_std']:.4f}")
+    for region in ("head", "filler", "end", "all"):
+        if region in summary:
+            print(f"  {region:<7} mean |diff| {summary[region]['mean']:.6f}  max |diff| {summary[region]['max']:.6f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"arguments": vars(args), "segments": results, "summary": summary}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
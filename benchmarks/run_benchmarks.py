@@ -0,0 +1,361 @@
+"""
+Offline benchmarks for LoadImagesFromDirectory and WanKeyframeToVideo.
+
+Runs on CPU with stub CLIP / VAE / ComfyUI modules (see stubs.py) and synthetic
+keyframe directories, and reports latency percentiles, throughput and peak
+memory per scenario. Results can be saved as a baseline and later runs compared
+against it:
+
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json
+
+The exit code is 1 when a scenario regressed beyond the tolerance.
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+
+import numpy as np
+import torch
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import stubs  # noqa: E402
+
+SORT_MODES = ["name_asc", "date_asc", "size_asc", "none"]
+RESIZE_MODES = ["stretch", "fit", "crop"]
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def parse_list(text, cast=str):
+    return [cast(item) for item in text.split(",") if item.strip()]
+
+
+def make_keyframe_directory(root, count, width, height, image_format):
+    """
+    Create (or reuse) a directory of count synthetic keyframes: smooth gradients
+    plus noise, so file sizes vary, with shuffled modification times.
+    """
+    name = f"keyframes_{count}_{width}x{height}_{image_format}"
+    directory = os.path.join(root, name)
+    if os.path.isdir(directory) and len(os.listdir(directory)) == count:
+        return name
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(count)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    mtimes = list(range(count))
+    random.Random(count).shuffle(mtimes)
+    for i in range(count):
+        phase = i / max(1, count)
+        base = np.stack([
+            127 + 100 * np.sin(x / width * 6.28 + phase * 6.28),
+            127 + 100 * np.cos(y / height * 6.28 + phase * 3.14),
+            np.full_like(x, 255 * phase),
+        ], axis=-1)
+        noise = rng.normal(0, 4 + 20 * (i % 5), size=base.shape)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        path = os.path.join(directory, f"frame_{i:05d}.{image_format}")
+        if image_format == "jpg":
+            Image.fromarray(pixels).save(path, quality=90)
+        else:
+            Image.fromarray(pixels).save(path)
+        os.utime(path, (1_600_000_000 + mtimes[i] * 60,) * 2)
+    return name
+
+
+def measure(run, repeats, warmup, profiler_cls):
+    """
+    Call run() warmup + repeats times. Returns per-repeat latencies (seconds)
+    and the highest peak RSS (MB) seen during a timed repeat.
+    """
+    for _ in range(warmup):
+        run()
+
+    latencies = []
+    peak_rss = None
+    for _ in range(repeats):
+        profiler = profiler_cls("benchmark")
+        start = time.perf_counter()
+        with profiler.stage("run"):
+            run()
+        latencies.append(time.perf_counter() - start)
+        record = profiler.records()[0]
+        peak = record.get("peak_rss_mb", record.get("process_peak_rss_mb"))
+        if peak is not None:
+            peak_rss = max(peak_rss or 0.0, peak)
+    return latencies, peak_rss
+
+
+def summarize(name, items, latencies, peak_rss, stages=None):
+    latencies = np.asarray(latencies)
+    result = {
+        "scenario": name,
+        "items": items,
+        "repeats": len(latencies),
+        "p50_s": float(np.percentile(latencies, 50)),
+        "p90_s": float(np.percentile(latencies, 90)),
+        "p99_s": float(np.percentile(latencies, 99)),
+        "mean_s": float(latencies.mean()),
+        "throughput_per_s": float(items / latencies.mean()),
+        "peak_rss_mb": peak_rss,
+    }
+    if stages:
+        result["stages"] = stages
+    return result
+
+
+def stage_seconds(profile_text):
+    """
+    {stage: seconds} from a node's profile output.
+    """
+    stages = {}
+    for line in profile_text.splitlines():
+        record = json.loads(line)
+        if record["stage"] != "total":
+            stages[record["stage"]] = record["seconds"]
+    return stages
+
+
+def bench_load(package, args, root):
+    loader = package.nodes.LoadImagesFromDirectory.LoadImagesFromDirectory()
+    target_width, target_height = parse_size(args.target)
+    results = []
+
+    for resolution in parse_list(args.resolutions):
+        width, height = parse_size(resolution)
+        directory = make_keyframe_directory(root, args.images, width, height, args.format)
+        for backend in parse_list(args.backends):
+            for resize_mode in RESIZE_MODES:
+                for sort_mode in SORT_MODES:
+                    params = dict(
+                        directory=directory, reload_on_execute=False, target_width=target_width,
+                        target_height=target_height, resize_mode=resize_mode, sort_mode=sort_mode,
+                        cache_mode="disabled", resize_backend=backend, workers=args.workers,
+                    )
+                    latencies, peak = measure(lambda: loader.load_images(**params), args.repeats, args.warmup,
+                                              package.nodes.stage_profiler.StageProfiler)
+                    stages = stage_seconds(loader.load_images(**params, profile=True)[1]) if args.stages else None
+                    name = f"load/{resolution}/{backend}/{resize_mode}/{sort_mode}"
+                    results.append(summarize(name, args.images, latencies, peak, stages))
+                    report(results[-1])
+
+        # Warm decoded-image cache: every file is a hit
+        params = dict(
+            directory=directory, reload_on_execute=False, target_width=target_width, target_height=target_height,
+            resize_mode="crop", sort_mode="name_asc", cache_mode="memory",
+        )
+        latencies, peak = measure(lambda: loader.load_images(**params), args.repeats, max(1, args.warmup),
+                                  package.nodes.stage_profiler.StageProfiler)
+        results.append(summarize(f"load/{resolution}/cached", args.images, latencies, peak))
+        report(results[-1])
+    return results
+
+
+def bench_encode(package, args):
+    encoder = package.nodes.WanKeyframeToVideo.WanKeyframeToVideo()
+    segments_node = package.nodes.WanKeyframeToVideoSegments.WanKeyframeToVideoSegments()
+    clip_vision = sys.modules["comfy.clip_vision"]
+    keyframe_width, keyframe_height = parse_size(args.keyframe_size)
+    width, height = parse_size(args.video_size)
+    results = []
+
+    for num_segments in parse_list(args.segments, int):
+        keyframes = torch.rand(num_segments + 1, keyframe_height, keyframe_width, 3,
+                               generator=torch.Generator().manual_seed(num_segments))
+        prompt = "\n".join(f"[{i}] synthetic prompt for segment {i}" for i in range(num_segments))
+        clip_vision_outputs = None
+        if args.clip_vision:
+            clip_vision_outputs = []
+            for _ in range(num_segments + 1):
+                output = clip_vision.Output()
+                output.penultimate_hidden_states = torch.randn(1, 257, 1280)
+                clip_vision_outputs.append(output)
+
+        vae = stubs.StubVAE()
+        common = dict(
+            positive_prompt=prompt, negative_prompt="low quality", width=width, height=height,
+            fps=args.fps, seconds=args.seconds, keyframes=keyframes, clip_vision_outputs=clip_vision_outputs,
+        )
+
+        def cold(node, vae=vae, **options):
+            # A fresh CLIP handle misses the text-encode cache; reuse_segments=False re-encodes every segment
+            def run():
+                clip = stubs.StubCLIP(args.text_tokens, args.text_dim, args.text_dim)
+                return getattr(node, node.FUNCTION)(clip=clip, vae=vae, reuse_segments=False, **dict(common, **options))
+            return run
+
+        warm_clip = stubs.StubCLIP(args.text_tokens, args.text_dim, args.text_dim)
+
+        def warm():
+            return encoder.encode(clip=warm_clip, vae=vae, reuse_segments=True, **common)
+
+        for name, node in (("encode", encoder), ("segments", segments_node)):
+            latencies, peak = measure(cold(node), args.repeats, args.warmup,
+                                      package.nodes.stage_profiler.StageProfiler)
+            stages = None
+            if args.stages:
+                clip = stubs.StubCLIP(args.text_tokens, args.text_dim, args.text_dim)
+                output = getattr(node, node.FUNCTION)(clip=clip, vae=vae, reuse_segments=False, profile=True, **common)
+                stages = stage_seconds(output[3])
+            results.append(summarize(f"{name}/{num_segments}", num_segments, latencies, peak, stages))
+            report(results[-1])
+
+        latencies, peak = measure(warm, args.repeats, max(1, args.warmup), package.nodes.stage_profiler.StageProfiler)
+        results.append(summarize(f"encode/{num_segments}/reused", num_segments, latencies, peak))
+        report(results[-1])
+
+        # VAE encode paths: several clips per first-stage batch, clip by clip in tiles,
+        # and the cached gray filler against full filler encoding of longer segments
+        batch_bytes = vae.memory_used_encode((args.vae_batch_clips, 3, 1, height, width), vae.vae_dtype)
+        # Filler segments are long enough for filler_mode "cached" to apply; one clip per batch keeps them in RAM
+        clip_mb = -(-vae.memory_used_encode((1, 3, 1, height, width), vae.vae_dtype) // (1024 * 1024))
+        encode_paths = (
+            ("batched", "batched_encodes", {"vae_batch_mb": -(-batch_bytes // (1024 * 1024))}),
+            ("tiled", "tiled_encodes", {"encode_mode": "tiled", "vae_batch_mb": args.tile_budget_mb}),
+            ("filler_full", None, {"seconds": args.filler_seconds, "vae_batch_mb": clip_mb}),
+            ("filler_cached", None, {"seconds": args.filler_seconds, "filler_mode": "cached", "vae_batch_mb": clip_mb}),
+        )
+        for name, counter, options in encode_paths:
+            path_vae = stubs.StubVAE()
+            latencies, peak = measure(cold(encoder, vae=path_vae, **options), args.repeats, args.warmup,
+                                      package.nodes.stage_profiler.StageProfiler)
+            if counter is not None and getattr(path_vae, counter) == 0:
+                print(f"Warning: encode/{num_segments}/{name} did not use the {name} encode path")
+            results.append(summarize(f"encode/{num_segments}/{name}", num_segments, latencies, peak))
+            report(results[-1])
+    return results
+
+
+def report(result):
+    peak = "n/a" if result["peak_rss_mb"] is None else f"{result['peak_rss_mb']:.0f} MB"
+    print(
+        f"{result['scenario']:<48} p50 {result['p50_s'] * 1000:9.1f} ms  p90 {result['p90_s'] * 1000:9.1f} ms  "
+        f"p99 {result['p99_s'] * 1000:9.1f} ms  {result['throughput_per_s']:9.1f}/s  peak {peak}",
+        flush=True,
+    )
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """
+    Print regressions against baseline results. Returns the number of regressions.
+    Latency compares p50; memory compares peak RSS.
+    """
+    previous = {result["scenario"]: result for result in baseline["results"]}
+    regressions = 0
+    print("\nComparison with baseline:")
+    for result in results:
+        base = previous.get(result["scenario"])
+        if base is None:
+            print(f"  {result['scenario']:<48} new")
+            continue
+        latency_ratio = result["p50_s"] / base["p50_s"] if base["p50_s"] else 1.0
+        flags = []
+        if latency_ratio > 1.0 + tolerance:
+            flags.append("SLOWER")
+        memory_ratio = None
+        if result["peak_rss_mb"] and base.get("peak_rss_mb"):
+            memory_ratio = result["peak_rss_mb"] / base["peak_rss_mb"]
+            if memory_ratio > 1.0 + memory_tolerance:
+                flags.append("MORE MEMORY")
+        regressions += bool(flags)
+        memory = "" if memory_ratio is None else f"  memory x{memory_ratio:.2f}"
+        print(f"  {result['scenario']:<48} p50 x{latency_ratio:.2f}{memory}  {' '.join(flags)}")
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=["all", "load", "encode"], default="all")
+    parser.add_argument("--workdir", default=None, help="Where synthetic keyframes are generated (default: a temp dir)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--stages", action="store_true", help="Add a per-stage breakdown from the nodes' profile output")
+    # Loader
+    parser.add_argument("--images", type=int, default=48, help="Keyframes per synthetic directory")
+    parser.add_argument("--resolutions", default="1920x1080", help="Comma-separated source resolutions")
+    parser.add_argument("--format", choices=["jpg", "png"], default="jpg")
+    parser.add_argument("--target", default="512x512", help="target_width x target_height")
+    parser.add_argument("--backends", default="pil", help="Comma-separated resize backends")
+    parser.add_argument("--workers", type=int, default=0)
+    # Encoder
+    parser.add_argument("--segments", default="4,16,32", help="Comma-separated segment counts")
+    parser.add_argument("--keyframe-size", default="512x512")
+    parser.add_argument("--video-size", default="496x496")
+    parser.add_argument("--fps", type=int, default=16)
+    parser.add_argument("--seconds", type=int, default=1)
+    parser.add_argument("--text-tokens", type=int, default=512)
+    parser.add_argument("--text-dim", type=int, default=4096)
+    parser.add_argument("--no-clip-vision", dest="clip_vision", action="store_false")
+    parser.add_argument("--vae-batch-clips", type=int, default=8, help="Clips per VAE batch in the batched scenario")
+    parser.add_argument("--tile-budget-mb", type=int, default=1024, help="vae_batch_mb of the tiled scenario")
+    parser.add_argument("--filler-seconds", type=int, default=32, help="Segment length of the filler scenarios")
+    # Baseline
+    parser.add_argument("--output", help="Write results as JSON")
+    parser.add_argument("--save-baseline", help="Write results as the new baseline")
+    parser.add_argument("--baseline", help="Compare against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative p50 latency increase")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10, help="Allowed relative peak RSS increase")
+    args = parser.parse_args(argv)
+
+    temp_dir = None
+    if args.workdir is None:
+        temp_dir = tempfile.TemporaryDirectory(prefix="wankeyframing-bench-")
+        args.workdir = temp_dir.name
+    os.makedirs(args.workdir, exist_ok=True)
+
+    stubs.install_stubs(args.workdir)
+    package = stubs.load_package()
+    # Keep directory manifests out of the extension folder
+    package.nodes.directory_index.DIRECTORY_INDEX.manifest_dir = os.path.join(args.workdir, "manifests")
+
+    print(f"Environment: {json.dumps(environment())}")
+    results = []
+    try:
+        if args.suite in ("all", "load"):
+            results += bench_load(package, args, args.workdir)
+        if args.suite in ("all", "encode"):
+            results += bench_encode(package, args)
+    finally:
+        if temp_dir is not None:
+            temp_dir.cleanup()
+
+    document = {"environment": environment(), "arguments": vars(args), "results": results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(document, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("environment") != document["environment"]:
+            print("Warning: Baseline was recorded in a different environment; compare with care")
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        if regressions:
+            print(f"{regressions} scenario(s) regressed")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
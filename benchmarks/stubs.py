@@ -0,0 +1,209 @@
+"""
+Lightweight stand-ins for the ComfyUI modules and models used by the nodes, so
+the nodes can be benchmarked on CPU without a ComfyUI install or model weights.
+
+The stubs keep the shapes and call patterns of the real objects (text embeddings
+of a Wan-sized text encoder, a video VAE with 8x spatial / 4x temporal
+compression), but their compute is trivial. Benchmarks therefore measure the
+nodes' own work: file I/O, decoding, resizing, caching, tensor assembly and
+stacking - not model inference.
+"""
+import os
+import sys
+import types
+import importlib.util
+
+import torch
+import torch.nn.functional as F
+
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "wankeyframing"
+
+
+class StubCLIP:
+    """
+    CLIP handle passed to the nodes. Embedding shapes are configurable.
+    """
+
+    def __init__(self, tokens=512, dim=4096, pooled_dim=4096):
+        self.tokens = tokens
+        self.dim = dim
+        self.pooled_dim = pooled_dim
+        self.encodes = 0
+
+
+class StubCLIPTextEncode:
+    """
+    Replacement for nodes.CLIPTextEncode: a deterministic random embedding per text.
+    """
+
+    def encode(self, clip, text):
+        clip.encodes += 1
+        generator = torch.Generator().manual_seed(sum(text.encode("utf-8")) % (2 ** 31))
+        cond = torch.randn(1, clip.tokens, clip.dim, generator=generator)
+        pooled = torch.randn(1, clip.pooled_dim, generator=generator)
+        return ([[cond, {"pooled_output": pooled}]],)
+
+
+class StubFirstStageModel:
+    """
+    The VAE's first stage model: encode() of a batch of clips [B, 3, T, H, W] in -1..1.
+    """
+
+    def __init__(self, vae):
+        self.vae = vae
+
+    def encode(self, x):
+        self.vae.batched_encodes += 1
+        return self.vae.encode_pixels((x.float() + 1.0) / 2.0)
+
+
+class StubVAE:
+    """
+    Video VAE with the interface the nodes use: encode() of a [T, H, W, C] clip
+    to a [1, latent_channels, (T - 1) // 4 + 1, H / 8, W / 8] latent,
+    encode_tiled(), spacial_compression_encode(), and the attributes batched
+    encoding goes through (memory_used_encode(), process_input(),
+    first_stage_model, patcher, dtype and devices). Encoding is average pooling
+    plus a channel projection, so its cost scales with the number of pixels.
+    """
+
+    latent_channels = 16
+    vae_dtype = torch.float32
+    device = torch.device("cpu")
+    output_device = torch.device("cpu")
+
+    def __init__(self, scale=8):
+        self.scale = scale
+        self.projection = torch.randn(self.latent_channels, 3, generator=torch.Generator().manual_seed(0))
+        self.first_stage_model = StubFirstStageModel(self)
+        self.patcher = object()
+        self.encoded_frames = 0
+        self.batched_encodes = 0
+        self.tiled_encodes = 0
+
+    def spacial_compression_encode(self):
+        return self.scale
+
+    def memory_used_encode(self, shape, dtype):
+        """
+        Encode memory estimate of the Wan VAE for [B, C, T, H, W]: per clip it
+        depends on the frame size only, since frames are encoded in causal chunks.
+        """
+        return shape[0] * 6000 * shape[3] * shape[4] * torch.empty((), dtype=dtype).element_size()
+
+    def process_input(self, image):
+        return image * 2.0 - 1.0
+
+    def encode_pixels(self, x):
+        """
+        [B, 3, T, H, W] in 0..1 to [B, latent_channels, (T - 1) // 4 + 1, H / scale, W / scale].
+        """
+        self.encoded_frames += x.shape[0] * x.shape[2]
+        # Causal temporal compression: the first frame alone, then groups of 4
+        first, rest = x[:, :, :1], x[:, :, 1:]
+        if rest.shape[2] > 0:
+            rest = F.avg_pool3d(rest, (4, 1, 1), ceil_mode=True)
+            x = torch.cat([first, rest], dim=2)
+        else:
+            x = first
+        x = F.avg_pool3d(x, (1, self.scale, self.scale))
+        return torch.einsum("bcthw,oc->bothw", x, self.projection)
+
+    def encode(self, pixels):
+        return self.encode_pixels(pixels[..., :3].float().movedim(-1, 0).unsqueeze(0))  # [1, 3, T, H, W]
+
+    def encode_tiled(self, pixels, tile_x=512, tile_y=512, overlap=64, tile_t=None, overlap_t=None):
+        """
+        encode() in spatial tiles of tile_x by tile_y pixels. Tiles are placed
+        side by side: the stub's encoding is local, so no overlap is needed.
+        """
+        self.tiled_encodes += 1
+        x = pixels[..., :3].float().movedim(-1, 0).unsqueeze(0)
+        frames, height, width = x.shape[2:]
+        latent = torch.empty(
+            1, self.latent_channels, (frames - 1) // 4 + 1, height // self.scale, width // self.scale
+        )
+        for top in range(0, height, tile_y):
+            for left in range(0, width, tile_x):
+                tile = self.encode_pixels(x[..., top:top + tile_y, left:left + tile_x])
+                row, column = top // self.scale, left // self.scale
+                latent[..., row:row + tile.shape[-2], column:column + tile.shape[-1]] = tile
+        return latent
+
+
+def common_upscale(samples, width, height, upscale_method, crop):
+    """
+    Replacement for comfy.utils.common_upscale on [B, C, H, W] tensors.
+    """
+    if crop == "center":
+        old_height, old_width = samples.shape[-2:]
+        old_aspect = old_width / old_height
+        new_aspect = width / height
+        x = y = 0
+        if old_aspect > new_aspect:
+            x = round((old_width - old_width * (new_aspect / old_aspect)) / 2)
+        elif old_aspect < new_aspect:
+            y = round((old_height - old_height * (old_aspect / new_aspect)) / 2)
+        samples = samples[..., y:old_height - y, x:old_width - x]
+    mode = upscale_method if upscale_method in ("bilinear", "bicubic", "nearest") else "bilinear"
+    return F.interpolate(samples, size=(height, width), mode=mode)
+
+
+def install_stubs(input_directory):
+    """
+    Register stub folder_paths, nodes and comfy modules in sys.modules.
+    input_directory is returned by folder_paths.get_input_directory().
+    """
+    folder_paths = types.ModuleType("folder_paths")
+    folder_paths.get_input_directory = lambda: input_directory
+    folder_paths.get_output_directory = lambda: input_directory
+    folder_paths.get_temp_directory = lambda: input_directory
+
+    nodes = types.ModuleType("nodes")
+    nodes.CLIPTextEncode = StubCLIPTextEncode
+
+    comfy = types.ModuleType("comfy")
+    comfy.__path__ = []
+
+    utils = types.ModuleType("comfy.utils")
+    utils.common_upscale = common_upscale
+
+    model_management = types.ModuleType("comfy.model_management")
+    model_management.intermediate_device = lambda: torch.device("cpu")
+    model_management.get_torch_device = lambda: torch.device("cpu")
+    model_management.get_free_memory = lambda device=None, torch_free_too=False: 16 * 1024 ** 3
+    model_management.load_models_gpu = lambda models, memory_required=0, **kwargs: None
+    model_management.soft_empty_cache = lambda force=False: None
+    model_management.OOM_EXCEPTION = torch.cuda.OutOfMemoryError
+
+    clip_vision = types.ModuleType("comfy.clip_vision")
+    clip_vision.Output = type("Output", (), {})
+
+    comfy.utils = utils
+    comfy.model_management = model_management
+    comfy.clip_vision = clip_vision
+    sys.modules.update({
+        "folder_paths": folder_paths,
+        "nodes": nodes,
+        "comfy": comfy,
+        "comfy.utils": utils,
+        "comfy.model_management": model_management,
+        "comfy.clip_vision": clip_vision,
+    })
+
+
+def load_package():
+    """
+    Import this repository as a package (the way ComfyUI imports custom nodes).
+    install_stubs() must be called first.
+    """
+    if PACKAGE_NAME in sys.modules:
+        return sys.modules[PACKAGE_NAME]
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME, os.path.join(PACKAGE_ROOT, "__init__.py"), submodule_search_locations=[PACKAGE_ROOT]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = package
+    spec.loader.exec_module(package)
+    return package
@@ -1,11 +1,48 @@
 import os
+import sys
+import fnmatch
+import hashlib
+import threading
+from collections import deque
+from contextlib import nullcontext
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import numpy as np
 import torch
 import folder_paths
 
-from PIL import Image
+from .keyframe_cache import DECODED_IMAGE_CACHE, make_cache_key
+from .directory_index import DIRECTORY_INDEX
+from .keyframe_sources import CONTAINER_INDEX, is_container
+from .stage_profiler import StageProfiler, NULL_PROFILER
+from .torch_resize import RESIZE_CHUNK, resize_tensor, fit_size, to_uint8
+
+# Decoding lives in a standalone module imported by its top-level name, so that
+# decode worker processes can import it as well (see process_pool_context)
+DECODE_WORKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "decode_worker")
+if DECODE_WORKER_DIR not in sys.path:
+    sys.path.append(DECODE_WORKER_DIR)
+import wankeyframing_decode as decode_worker  # noqa: E402
 
 MAX_RES = 8192 
+SUPPORTED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
+# Keep the pre-shrunk image at least this many times the target size before the final LANCZOS pass.
+# 0 (the default) disables pre-shrinking: its error depends on the image content, so it is opt-in
+PRESCALE_MARGIN = 0.0
+RESIZE_BACKENDS = {
+    "pil": None,
+    "torch_bilinear": "bilinear",
+    "torch_bicubic": "bicubic",
+    "torch_lanczos": "lanczos",
+}
+# Decode jobs kept in flight per pool worker; bounds memory when the consumer is slower
+DECODE_READ_AHEAD = 2
+OUTPUT_DTYPES = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
 
 class LoadImagesFromDirectory:
     @classmethod
@@ -18,77 +55,132 @@ class LoadImagesFromDirectory:
                 "target_height": ("INT", {"default": 512, "min": 64, "max": MAX_RES, "step": 8}),
                 "resize_mode": (["stretch", "fit", "crop"], {"default": "crop"}),
                 "sort_mode": (["name_asc", "name_desc", "date_asc", "date_desc", "size_asc", "size_desc", "none"], {"default": "name_asc"}),
+            },
+            "optional": {
+                "pattern": ("STRING", {"default": "*"}),
+                "index_range": ("STRING", {"default": ""}),
+                "cache_mode": (["memory", "memory_and_disk", "disabled"], {"default": "memory"}),
+                "disk_cache_mb": ("INT", {"default": 2048, "min": 0, "max": 1048576, "step": 64}),
+                "parallel_mode": (["thread", "process", "off"], {"default": "thread"}),
+                "workers": ("INT", {"default": 0, "min": 0, "max": 256}),
+                "output_dtype": (list(OUTPUT_DTYPES), {"default": "float32"}),
+                "prescale_margin": ("FLOAT", {"default": PRESCALE_MARGIN, "min": 0.0, "max": 16.0, "step": 0.5}),
+                "resize_backend": (list(RESIZE_BACKENDS), {"default": "pil"}),
+                "profile": ("BOOLEAN", {"default": False}),
             }
         }
 
-    RETURN_TYPES = ("IMAGE",)
-    RETURN_NAMES = ("images",)
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("images", "profile")
     FUNCTION = "load_images"
     CATEGORY = "Load"
 
     @classmethod
-    def IS_CHANGED(cls, directory, reload_on_execute, target_width, target_height, resize_mode, sort_mode):
+    def IS_CHANGED(cls, directory, reload_on_execute, target_width, target_height, resize_mode, sort_mode, **kwargs):
         """
-        Force node to re-execute when reload_on_execute is True.
-        Returns a unique value each time to bypass caching.
+        Re-execute when reload_on_execute is True and the directory contents changed.
+        Returns a fingerprint of file names, mtimes and sizes, so an unchanged
+        directory keeps ComfyUI's cached output. Archives and multi-frame images
+        are fingerprinted the same way from their entries.
         """
+        params = f"{directory}_{target_width}_{target_height}_{resize_mode}_{sort_mode}"
+        for name in sorted(kwargs):
+            params += f"_{kwargs[name]}"
         if reload_on_execute:
-            import time
-            return str(time.time())
-        return f"{directory}_{target_width}_{target_height}_{resize_mode}_{sort_mode}"
+            full_dir = os.path.join(folder_paths.get_input_directory(), directory)
+            if not os.path.isdir(full_dir) and not is_container(full_dir):
+                return f"{params}_missing"
+            file_paths, stats = cls().resolve_files(
+                full_dir, sort_mode, kwargs.get("pattern", "*"), kwargs.get("index_range", "")
+            )
+            return f"{params}_{cls.directory_fingerprint(file_paths, stats)}"
+        return params
 
-    def resize_image(self, pil_img, target_width, target_height, resize_mode):
+    @classmethod
+    def directory_fingerprint(cls, file_paths, stats=None):
         """
-        Resize PIL image to target dimensions based on resize mode.
+        Cheap content fingerprint of the selected images: a hash over
+        (name, mtime, size) of every file. No image data is read.
         """
-        original_width, original_height = pil_img.size
-        
-        if resize_mode == "stretch":
-            # Simple stretch to exact dimensions
-            return pil_img.resize((target_width, target_height), Image.Resampling.LANCZOS)
-        
-        elif resize_mode == "fit":
-            # Fit image inside target dimensions maintaining aspect ratio
-            pil_img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS)
-            
-            # Create a new image with target dimensions and paste the resized image centered
-            new_img = Image.new("RGB", (target_width, target_height), (0, 0, 0))
-            paste_x = (target_width - pil_img.width) // 2
-            paste_y = (target_height - pil_img.height) // 2
-            new_img.paste(pil_img, (paste_x, paste_y))
-            return new_img
-        
-        elif resize_mode == "crop":
-            # Crop to fit target dimensions maintaining aspect ratio
-            original_aspect = original_width / original_height
-            target_aspect = target_width / target_height
-            
-            if original_aspect > target_aspect:
-                # Image is wider, crop width
-                new_height = original_height
-                new_width = int(original_height * target_aspect)
-                left = (original_width - new_width) // 2
-                top = 0
-                right = left + new_width
-                bottom = original_height
-            else:
-                # Image is taller, crop height
-                new_width = original_width
-                new_height = int(original_width / target_aspect)
-                left = 0
-                top = (original_height - new_height) // 2
-                right = original_width
-                bottom = top + new_height
-            
-            cropped = pil_img.crop((left, top, right, bottom))
-            return cropped.resize((target_width, target_height), Image.Resampling.LANCZOS)
-        
-        return pil_img
+        stats = {} if stats is None else stats
+        h = hashlib.sha1()
+        for fpath in file_paths:
+            try:
+                st = stats.get(fpath) or os.stat(fpath)
+            except OSError:
+                continue
+            h.update(f"{os.path.basename(fpath)}:{st.st_mtime_ns}:{st.st_size};".encode("utf-8"))
+        return h.hexdigest()
+
+    def parse_index_range(self, index_range):
+        """
+        Parse an index range "start:end" (Python slice semantics on the sorted
+        file list, either bound optional) into a slice. An empty string selects all.
+        """
+        index_range = index_range.strip()
+        if not index_range:
+            return slice(None)
+        parts = index_range.split(":")
+        if len(parts) != 2:
+            raise ValueError(f"Invalid index_range '{index_range}', expected 'start:end'")
+        try:
+            start, end = (int(part) if part.strip() else None for part in parts)
+        except ValueError:
+            raise ValueError(f"Invalid index_range '{index_range}', expected 'start:end'")
+        return slice(start, end)
+
+    def resolve_files(self, full_dir, sort_mode, pattern="*", index_range=""):
+        """
+        List, filter and sort the image files of full_dir.
+        Returns (file_paths, stats) where stats maps path -> os.stat_result for
+        every file whose stat data is already known.
+        When full_dir is an archive or multi-frame image, file_paths are virtual
+        paths (container path joined with the entry name) and stats holds an
+        EntryStat for every entry.
+        """
+        if is_container(full_dir):
+            container = CONTAINER_INDEX.get(full_dir, SUPPORTED_EXTENSIONS)
+            names, scan_stats = container.names, container.stats
+        else:
+            # Collect all valid image files first (reuses the directory manifest when unchanged)
+            names, scan_stats = DIRECTORY_INDEX.scan(full_dir, SUPPORTED_EXTENSIONS)
+
+        if pattern and pattern != "*":
+            names = [name for name in names if fnmatch.fnmatch(name, pattern)]
+
+        file_paths = [os.path.join(full_dir, name) for name in names]
+        stats = {os.path.join(full_dir, name): st for name, st in scan_stats.items()}
+
+        # Sort the files according to sort_mode, then select the requested range
+        sorted_files = self.sort_files(file_paths, sort_mode, stats)
+        return sorted_files[self.parse_index_range(index_range)], stats
+
+    def resize_image(self, pil_img, target_width, target_height, resize_mode, prescale_margin=0.0):
+        """
+        Resize PIL image to target dimensions based on resize mode (see decode_worker.resize_image).
+        """
+        return decode_worker.resize_image(pil_img, target_width, target_height, resize_mode, prescale_margin)
+
+    def crop_box(self, original_width, original_height, target_width, target_height):
+        """
+        Centered (left, top, right, bottom) box with the target aspect ratio.
+        """
+        return decode_worker.crop_box(original_width, original_height, target_width, target_height)
+
+    def draft_size(self, source_size, target_width, target_height, resize_mode, prescale_margin):
+        """
+        Smallest full-image size that still leaves prescale_margin times the target
+        resolution for the final resample. Returns None when no reduction is possible.
+        """
+        return decode_worker.draft_size(source_size, target_width, target_height, resize_mode, prescale_margin)
 
-    def sort_files(self, file_paths, sort_mode):
+    def sort_files(self, file_paths, sort_mode, stats=None):
         """
         Sort file paths based on the specified sort mode.
+        stats optionally maps path -> os.stat_result; known entries are reused and
+        newly stat'ed files are added to it.
         """
+        stats = {} if stats is None else stats
         if sort_mode == "none":
             return file_paths
         
@@ -101,7 +193,9 @@ class LoadImagesFromDirectory:
             file_stats = []
             for fpath in file_paths:
                 try:
-                    stat = os.stat(fpath)
+                    stat = stats.get(fpath)
+                    if stat is None:
+                        stat = stats[fpath] = os.stat(fpath)
                     if sort_mode.startswith("date"):
                         # Sort by modification time
                         file_stats.append((stat.st_mtime, fpath))
@@ -120,70 +214,362 @@ class LoadImagesFromDirectory:
         
         return file_paths
 
-    def pil_to_comfy_tensor(self, pil_img):
+    def decode_image(self, fpath, target_width, target_height, resize_mode, prescale_margin=0.0, resize_backend="pil"):
         """
-        Convert a PIL.Image (RGB) to a torch tensor shaped (1, H, W, 3),
-        dtype=float32 and values in [0,1], compatible with ComfyUI batch expectations.
+        Open, convert and resize a single image file (a path or a file object).
+        Returns a uint8 array shaped (H, W, 3). With a torch resize backend the
+        image is only pre-shrunk (see prescale_margin) and resized later in batches.
         """
-        if pil_img.mode != "RGB":
-            pil_img = pil_img.convert("RGB")
+        return decode_worker.decode_image(
+            fpath, target_width, target_height, resize_mode, prescale_margin, resize_backend
+        )
 
-        arr = np.asarray(pil_img)  # shape (H, W, 3), dtype=uint8
-        # Ensure contiguous and float32 scaled to 0..1
-        arr = np.ascontiguousarray(arr).astype(np.float32) / 255.0
-        # Convert to torch tensor
-        t = torch.from_numpy(arr)  # shape (H, W, 3), dtype=float32
-        # Add batch dim -> (1, H, W, 3)
-        t = t.unsqueeze(0)
-        return t
+    def finish_image(self, im, target_width, target_height, resize_mode, prescale_margin=0.0, resize_backend="pil"):
+        """
+        Convert an opened image or container frame to RGB and resize it.
+        Returns a uint8 array shaped (H, W, 3).
+        """
+        return decode_worker.finish_image(
+            im, target_width, target_height, resize_mode, prescale_margin, resize_backend
+        )
+
+    def decode_files(self, file_paths, target_width, target_height, resize_mode, prescale_margin=0.0,
+                     parallel_mode="thread", workers=0, resize_backend="pil"):
+        """
+        Decode and resize file_paths, concurrently when parallel_mode is not "off".
+        PIL releases the GIL while decoding and resizing, so threads scale across cores.
+        Yields (position, array) pairs in the same order as file_paths, as soon as
+        each one is ready; position indexes into file_paths. Files are submitted
+        DECODE_READ_AHEAD per worker ahead of the consumer.
+        """
+        if workers <= 0:
+            workers = min(32, os.cpu_count() or 1)
+        workers = min(workers, len(file_paths))
 
-    def load_images(self, directory, reload_on_execute, target_width, target_height, resize_mode, sort_mode):
-        image_tensors = []
+        if parallel_mode == "off" or workers <= 1:
+            for pos, fpath in enumerate(file_paths):
+                try:
+                    arr = self.decode_image(
+                        fpath, target_width, target_height, resize_mode, prescale_margin, resize_backend
+                    )
+                except Exception as e:
+                    raise RuntimeError(f"Failed to load image {os.path.basename(fpath)}: {str(e)}")
+                yield pos, arr
+            return
 
+        with self.make_executor(parallel_mode == "process", workers) as executor:
+            pending = deque()
+            try:
+                for pos, fpath in enumerate(file_paths):
+                    pending.append((pos, executor.submit(
+                        decode_worker.decode_file, fpath, target_width, target_height, resize_mode, prescale_margin, resize_backend
+                    )))
+                    # Collect in submission order so the output follows sort_files
+                    if len(pending) >= workers * DECODE_READ_AHEAD:
+                        yield self.collect(pending.popleft(), file_paths)
+                while pending:
+                    yield self.collect(pending.popleft(), file_paths)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def decode_container(self, container_path, file_paths, target_width, target_height, resize_mode,
+                         prescale_margin=0.0, parallel_mode="thread", workers=0, resize_backend="pil"):
+        """
+        Decode entries of an archive or multi-frame image as a stream.
+        Entries are read in storage order through a single file handle and decoded
+        on the pool while reading continues; at most DECODE_READ_AHEAD entries per
+        worker are in flight. Yields (position, array) pairs in storage order; position indexes
+        into file_paths. Frames are always decoded on threads, as they are handed
+        over as PIL images.
+        """
+        container = CONTAINER_INDEX.get(container_path, SUPPORTED_EXTENSIONS)
+        prefix = len(os.path.join(container_path, ""))
+        sources = container.iter_entries([fpath[prefix:] for fpath in file_paths])
+        decode = decode_worker.decode_file if container.is_archive else decode_worker.finish_frame
+        args = (target_width, target_height, resize_mode, prescale_margin, resize_backend)
+
+        if workers <= 0:
+            workers = min(32, os.cpu_count() or 1)
+        workers = min(workers, len(file_paths))
+
+        if parallel_mode == "off" or workers <= 1:
+            for pos, source in sources:
+                try:
+                    arr = decode(source, *args)
+                except Exception as e:
+                    raise RuntimeError(f"Failed to load image {os.path.basename(file_paths[pos])}: {str(e)}")
+                yield pos, arr
+            return
+
+        with self.make_executor(parallel_mode == "process" and container.is_archive, workers) as executor:
+            pending = deque()
+            try:
+                for pos, source in sources:
+                    pending.append((pos, executor.submit(decode, source, *args)))
+                    # Bound the read-ahead so encoded entries do not pile up in memory
+                    while len(pending) >= workers * DECODE_READ_AHEAD or (pending and pending[0][1].done()):
+                        yield self.collect(pending.popleft(), file_paths)
+                while pending:
+                    yield self.collect(pending.popleft(), file_paths)
+            finally:
+                for _, future in pending:
+                    future.cancel()
+
+    def make_executor(self, use_processes, workers):
+        """
+        Pool for decoding: the shared process pool when processes are requested
+        (left running on exit), a new thread pool otherwise. Process workers run
+        the functions of the standalone decode worker module.
+        """
+        if use_processes:
+            return nullcontext(DECODE_PROCESS_POOL.get(workers))
+        return ThreadPoolExecutor(max_workers=workers)
+
+    def collect(self, entry, file_paths):
+        """
+        Wait for a (position, future) pair and return (position, array).
+        """
+        pos, future = entry
+        try:
+            return pos, future.result()
+        except BrokenProcessPool as e:
+            # A worker died or could not start: not the fault of the file being decoded
+            DECODE_PROCESS_POOL.reset()
+            raise RuntimeError(f"Decode process pool failed: {str(e)}")
+        except Exception as e:
+            raise RuntimeError(f"Failed to load image {os.path.basename(file_paths[pos])}: {str(e)}")
+
+    def load_images(self, directory, reload_on_execute, target_width, target_height, resize_mode, sort_mode,
+                    pattern="*", index_range="", cache_mode="memory", disk_cache_mb=2048, parallel_mode="thread", workers=0,
+                    output_dtype="float32", prescale_margin=PRESCALE_MARGIN, resize_backend="pil", profile=False):
+        profiler = StageProfiler("LoadImagesFromDirectory", enabled=profile)
+        full_dir, sorted_files, stats = self.resolve_source(directory, sort_mode, pattern, index_range, profiler)
+        profiler.note(images=len(sorted_files), width=target_width, height=target_height)
+
+        # Allocate the output batch once; every frame is written straight into its slot
+        batch = torch.empty(
+            (len(sorted_files), target_height, target_width, 3), dtype=OUTPUT_DTYPES[output_dtype]
+        )
+
+        images = self.iter_images(
+            full_dir, sorted_files, stats, target_width, target_height, resize_mode, cache_mode=cache_mode,
+            disk_cache_mb=disk_cache_mb, parallel_mode=parallel_mode, workers=workers,
+            prescale_margin=prescale_margin, resize_backend=resize_backend, profiler=profiler
+        )
+        for idx, arr in images:
+            with profiler.stage("convert"):
+                self.write_slot(batch, idx, arr)
+
+        # Normalize the whole batch to 0..1 in one vectorized, in-place step
+        with profiler.stage("convert"):
+            batch.div_(255.0)
+
+        return (batch, profiler.emit())
+
+    def resolve_source(self, directory, sort_mode, pattern="*", index_range="", profiler=NULL_PROFILER):
+        """
+        Resolve directory (a folder, archive or multi-frame image relative to the
+        input directory) and list its images.
+        Returns (full_dir, sorted_files, stats) and raises when there is nothing to load.
+        """
         base_dir = folder_paths.get_input_directory()
         full_dir = os.path.join(base_dir, directory)
 
         if not os.path.exists(full_dir):
             raise FileNotFoundError(f"Directory not found: {full_dir}")
- 
+        if not os.path.isdir(full_dir) and not is_container(full_dir):
+            raise ValueError(f"Not a directory, archive or multi-frame image: {full_dir}")
 
-        supported = (".png", ".jpg", ".jpeg", ".bmp", ".webp", ".tif", ".tiff")
-        
-        # Collect all valid image files first
-        valid_files = []
-        for fname in os.listdir(full_dir):
-            # skip non-string or hidden entries
-            if not isinstance(fname, str) or fname.startswith("."):
-                continue
+        # Collect, filter and sort the image files
+        with profiler.stage("scan"):
+            sorted_files, stats = self.resolve_files(full_dir, sort_mode, pattern, index_range)
 
-            if not fname.lower().endswith(supported):
-                # not a supported extension
-                continue
-
-            fpath = os.path.join(full_dir, fname)
-            valid_files.append(fpath)
-        
-        # Sort the files according to sort_mode
-        sorted_files = self.sort_files(valid_files, sort_mode)
-        
-        for fpath in sorted_files:
-            fname = os.path.basename(fpath)
-            try:
-                with Image.open(fpath) as im:
-                    original_size = im.size
-                    im = im.convert("RGB")
-                    
-                    # Resize image to target dimensions
-                    im = self.resize_image(im, target_width, target_height, resize_mode)
-                    
-                    t = self.pil_to_comfy_tensor(im)  # (1, H, W, 3)
-                    image_tensors.append(t)
-            except Exception as e:
-                raise RuntimeError(f"Failed to load image {fname}: {str(e)}")
-
-        if not image_tensors:
+        if not sorted_files:
             raise ValueError(f"No valid images found in: {full_dir}")
+        return full_dir, sorted_files, stats
+
+    def iter_images(self, full_dir, sorted_files, stats, target_width, target_height, resize_mode,
+                    cache_mode="memory", disk_cache_mb=2048, parallel_mode="thread", workers=0,
+                    prescale_margin=PRESCALE_MARGIN, resize_backend="pil", resize_chunk=RESIZE_CHUNK,
+                    profiler=NULL_PROFILER):
+        """
+        Yield (index, array) for every file of sorted_files, index being its position
+        and array the resized uint8 (target_height, target_width, 3) image.
+        Cache hits come first, then decoded files as they complete (in order for
+        folders, in storage order for containers). With a torch backend, up to
+        resize_chunk same-size images are resized together.
+        """
+        use_cache = cache_mode != "disabled"
+        use_disk = cache_mode == "memory_and_disk"
+        DECODED_IMAGE_CACHE.disk_max_bytes = disk_cache_mb * 1024 * 1024
+
+        # Look up every file in the cache; only misses are decoded
+        keys = [None] * len(sorted_files)
+        hits = []
+        missing = []
+        with profiler.stage("cache"):
+            for idx, fpath in enumerate(sorted_files):
+                arr = None
+                if use_cache:
+                    try:
+                        keys[idx] = make_cache_key(
+                            fpath, stats.get(fpath) or os.stat(fpath), target_width, target_height, resize_mode,
+                            prescale_margin, resize_backend
+                        )
+                    except OSError as e:
+                        raise RuntimeError(f"Failed to load image {os.path.basename(fpath)}: {str(e)}")
+                    arr = DECODED_IMAGE_CACHE.get(keys[idx], use_disk=use_disk)
+                if arr is None:
+                    missing.append(idx)
+                else:
+                    hits.append((idx, arr))
+        profiler.note(decoded=len(missing))
+        yield from hits
+        del hits
+
+        def store(idx, arr):
+            if use_cache:
+                with profiler.stage("cache"):
+                    DECODED_IMAGE_CACHE.put(keys[idx], arr, use_disk=use_disk)
+            return idx, arr
+
+        missing_files = [sorted_files[idx] for idx in missing]
+        if is_container(full_dir):
+            # Archives and multi-frame images stream their entries through one file handle
+            decoded = self.decode_container(
+                full_dir, missing_files, target_width, target_height, resize_mode,
+                prescale_margin=prescale_margin, parallel_mode=parallel_mode, workers=workers,
+                resize_backend=resize_backend
+            )
+        else:
+            decoded = self.decode_files(
+                missing_files, target_width, target_height, resize_mode,
+                prescale_margin=prescale_margin, parallel_mode=parallel_mode, workers=workers,
+                resize_backend=resize_backend
+            )
+        # Time spent waiting for decoded images (with the pil backend this includes resizing)
+        decoded = profiler.iterate("decode", decoded)
+        kernel = RESIZE_BACKENDS[resize_backend]
+        if kernel is None:
+            for pos, arr in decoded:
+                yield store(missing[pos], arr)
+            return
+
+        # Group decoded sources by size and resize each group as one tensor operation
+        buckets = {}
+        for pos, arr in decoded:
+            bucket = buckets.setdefault(arr.shape, [])
+            bucket.append((missing[pos], arr))
+            if len(bucket) >= resize_chunk:
+                with profiler.stage("resize"):
+                    resized = self.resize_bucket(bucket, sorted_files, target_width, target_height, resize_mode, kernel)
+                bucket.clear()
+                for idx, arr in resized:
+                    yield store(idx, arr)
+        for bucket in buckets.values():
+            if bucket:
+                with profiler.stage("resize"):
+                    resized = self.resize_bucket(bucket, sorted_files, target_width, target_height, resize_mode, kernel)
+                for idx, arr in resized:
+                    yield store(idx, arr)
+
+    def resize_batch(self, arrays, target_width, target_height, resize_mode, kernel="lanczos"):
+        """
+        Resize same-size uint8 (H, W, 3) arrays together with torch.
+        Applies the same crop / fit / stretch geometry as resize_image.
+        Returns a uint8 tensor shaped (N, target_height, target_width, 3).
+        """
+        # uint8 (N, 3, H, W) view in channels-last memory layout
+        images = torch.from_numpy(np.stack(arrays)).movedim(-1, 1)
+        original_height, original_width = images.shape[-2:]
+
+        if resize_mode == "stretch":
+            resized = resize_tensor(images, target_width, target_height, kernel)
+        elif resize_mode == "fit":
+            fit_width, fit_height = fit_size(original_width, original_height, target_width, target_height)
+            fitted = resize_tensor(images, fit_width, fit_height, kernel)
+            # Center the fitted images on a black canvas
+            resized = torch.zeros((images.shape[0], 3, target_height, target_width), dtype=fitted.dtype)
+            paste_x = (target_width - fit_width) // 2
+            paste_y = (target_height - fit_height) // 2
+            resized[:, :, paste_y:paste_y + fit_height, paste_x:paste_x + fit_width] = fitted
+        elif resize_mode == "crop":
+            left, top, right, bottom = self.crop_box(original_width, original_height, target_width, target_height)
+            resized = resize_tensor(images[:, :, top:bottom, left:right], target_width, target_height, kernel)
+        else:
+            resized = images
+
+        return to_uint8(resized)
+
+    def resize_bucket(self, bucket, file_paths, target_width, target_height, resize_mode, kernel):
+        """
+        Resize a bucket of (index, array) pairs with resize_batch.
+        Returns a list of (index, resized array) pairs.
+        """
+        try:
+            resized = self.resize_batch([arr for _, arr in bucket], target_width, target_height, resize_mode, kernel)
+        except Exception as e:
+            names = ", ".join(os.path.basename(file_paths[idx]) for idx, _ in bucket)
+            raise RuntimeError(f"Failed to resize images {names}: {str(e)}")
+        return [(idx, arr) for (idx, _), arr in zip(bucket, resized.numpy())]
+
+    def write_slot(self, batch, idx, arr):
+        """
+        Copy a uint8 (H, W, 3) array into batch[idx], casting to the batch dtype.
+        """
+        if arr.shape != tuple(batch.shape[1:]):
+            raise RuntimeError(f"Decoded image has shape {arr.shape}, expected {tuple(batch.shape[1:])}")
+        batch[idx].copy_(torch.from_numpy(arr))
+
+
+def process_pool_context():
+    """
+    Multiprocessing context for decode process pools. Workers start from a fresh
+    interpreter rather than a fork of the ComfyUI server, whose threads (event
+    loop, execution, CUDA) could leave a forked child deadlocked: forkserver
+    where available, spawn otherwise.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Only takes effect before the forkserver is started
+        context.set_forkserver_preload([decode_worker.__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class DecodeProcessPool:
+    """
+    Decode process pool kept between executions. A new worker process imports
+    the main script of the server again before it can decode, so workers are
+    started once and reused instead of per load. The pool grows when more
+    workers are requested, and is replaced after it breaks.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._workers = 0
+        self._lock = threading.Lock()
+
+    def get(self, workers):
+        with self._lock:
+            if self._executor is None or workers > self._workers:
+                if self._executor is not None:
+                    # Jobs already submitted by other loads still finish
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=process_pool_context())
+                self._workers = workers
+            return self._executor
+
+    def reset(self):
+        """
+        Drop the current pool, e.g. after a worker died; the next get() starts a new one.
+        """
+        with self._lock:
+            executor, self._executor, self._workers = self._executor, None, 0
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
 
-        # Concatenate along batch dim -> (batch, H, W, 3)
-        batch = torch.cat(image_tensors, dim=0)
-        return (batch,)
\ No newline at end of file
+# Shared between executions so process workers are only started once
+DECODE_PROCESS_POOL = DecodeProcessPool()
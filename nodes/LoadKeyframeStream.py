@@ -0,0 +1,39 @@
+from .LoadImagesFromDirectory import LoadImagesFromDirectory, OUTPUT_DTYPES, PRESCALE_MARGIN
+from .keyframe_stream import KeyframeStream
+
+
+class LoadKeyframeStream(LoadImagesFromDirectory):
+    """
+    Streaming variant of LoadImagesFromDirectory: outputs a KEYFRAME_STREAM that
+    WanKeyframeToVideo consumes while the remaining keyframes are still being
+    decoded, instead of a fully loaded IMAGE batch. Files are listed (and
+    missing or empty sources reported) when the node runs; decoding starts when
+    the encoder begins to read the stream.
+    """
+
+    @classmethod
+    def INPUT_TYPES(s):
+        inputs = LoadImagesFromDirectory.INPUT_TYPES()
+        optional = dict(inputs["optional"])
+        del optional["profile"]
+        optional["prefetch"] = ("INT", {"default": 8, "min": 1, "max": 256})
+        return {"required": inputs["required"], "optional": optional}
+
+    RETURN_TYPES = ("KEYFRAME_STREAM", "INT")
+    RETURN_NAMES = ("keyframe_stream", "count")
+    FUNCTION = "load_stream"
+    CATEGORY = "Load"
+
+    def load_stream(
+        self, directory, reload_on_execute, target_width, target_height, resize_mode, sort_mode,
+        pattern="*", index_range="", cache_mode="memory", disk_cache_mb=2048, parallel_mode="thread", workers=0,
+        output_dtype="float32", prescale_margin=PRESCALE_MARGIN, resize_backend="pil", prefetch=8
+    ):
+        full_dir, sorted_files, stats = self.resolve_source(directory, sort_mode, pattern, index_range)
+        stream = KeyframeStream(
+            self, full_dir, sorted_files, stats, target_width, target_height, OUTPUT_DTYPES[output_dtype],
+            prefetch=prefetch, resize_mode=resize_mode, cache_mode=cache_mode, disk_cache_mb=disk_cache_mb,
+            parallel_mode=parallel_mode, workers=workers, prescale_margin=prescale_margin,
+            resize_backend=resize_backend
+        )
+        return (stream, len(stream))
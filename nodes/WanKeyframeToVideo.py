@@ -1,10 +1,27 @@
-import re, torch
+import torch
+import hashlib
+import torch.nn.functional as F
 import nodes
 import comfy
 import comfy.utils
 import comfy.model_management
 
+from .model_cache import TEXT_ENCODE_CACHE, FILLER_LATENT_CACHE, SEGMENT_LATENT_CACHE
+from .prompt_schedule import compile_schedule
+from .stage_profiler import StageProfiler, NULL_PROFILER
+
 MAX_RES = 8192
+# Lower bounds and overlaps for tiled VAE encoding
+SPATIAL_TILE_MIN = 256
+SPATIAL_TILE_OVERLAP = 64
+TEMPORAL_TILE_MIN = 8
+TEMPORAL_TILE_OVERLAP = 8
+# Segments encoded together when keyframes arrive from a KEYFRAME_STREAM
+STREAM_WINDOW = 4
+# Temporal receptive field of the Wan 2.1 and 2.2 VAE encoders in latent frames: an input
+# frame changes its own latent frame and at most the 28 after it. With this much gray
+# context around the keyframes, filler_mode "cached" gives the same latents as "full"
+CAUSAL_ENCODER_CONTEXT = 29
 
 class WanKeyframeToVideo:
     @classmethod
@@ -22,15 +39,22 @@ class WanKeyframeToVideo:
             },
             "optional": {
                 "keyframes": ("IMAGE",),
+                "keyframe_stream": ("KEYFRAME_STREAM",),
                 "clip_vision_outputs": ("CLIP_VISION_OUTPUT",),
+                "filler_mode": (["full", "cached"], {"default": "full"}),
+                "filler_context": ("INT", {"default": CAUSAL_ENCODER_CONTEXT, "min": 1, "max": 64}),
+                "vae_batch_mb": ("INT", {"default": 0, "min": 0, "max": 1048576, "step": 256}),
+                "reuse_segments": ("BOOLEAN", {"default": True}),
+                "encode_mode": (["auto", "full", "tiled"], {"default": "auto"}),
+                "profile": ("BOOLEAN", {"default": False}),
             }
         }
 
-    RETURN_TYPES = ("CONDITIONING", "CONDITIONING", "LATENT")
-    RETURN_NAMES = ("positive", "negative", "latent")
+    RETURN_TYPES = ("CONDITIONING", "CONDITIONING", "LATENT", "STRING")
+    RETURN_NAMES = ("positive", "negative", "latent", "profile")
     FUNCTION = "encode"
     CATEGORY = "conditioning/video_models"
-    OUTPUT_IS_LIST = (False, False, False)
+    OUTPUT_IS_LIST = (False, False, False, False)
 
     def ensure_batch(self, img):
         """
@@ -45,152 +69,638 @@ class WanKeyframeToVideo:
             return img.unsqueeze(0)
         return img
 
-    def encode(
-        self, clip, positive_prompt, negative_prompt, vae, width, height, fps, seconds,
-        keyframes=None, clip_vision_outputs=None
-    ):
+    def frame_digest(self, frame):
+        """
+        Content hash of a single keyframe tensor (shape, dtype and raw bytes).
+        """
+        frame = frame.detach().contiguous().cpu()
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{tuple(frame.shape)}:{frame.dtype}".encode("utf-8"))
+        h.update(frame.view(torch.uint8).numpy().data)
+        return h.hexdigest()
+
+    def encode_text(self, clip, text):
+        """
+        CLIP text encode with memoization across segments and executions.
+        Identical prompts for the same CLIP model are encoded only once.
+        """
+        cond = TEXT_ENCODE_CACHE.get(clip, text)
+        if cond is None:
+            cond = nodes.CLIPTextEncode().encode(clip=clip, text=text)[0]
+            TEXT_ENCODE_CACHE.put(clip, text, cond)
+        return cond
+
+    def blend_text(self, clip, weights):
+        """
+        Conditioning for a weighted mix of prompts ((prompt, weight) pairs): the
+        weighted sum of the prompts' memoized encodings, so blending never runs
+        the text encoder more than once per prompt. Shorter embeddings are
+        zero-padded to the longest. A single prompt is returned as encoded.
+        """
+        if len(weights) == 1:
+            return self.encode_text(clip, weights[0][0])
+
+        encoded = [(self.encode_text(clip, prompt)[0], weight) for prompt, weight in weights]
+        tokens = max(cond[0].shape[1] for cond, _ in encoded)
+        embedding = sum(
+            F.pad(cond[0], (0, 0, 0, tokens - cond[0].shape[1])) * weight for cond, weight in encoded
+        )
+
+        # Other entries (pooled output, ...) follow the strongest prompt; pooled outputs are blended when they match
+        extras = dict(max(encoded, key=lambda entry: entry[1])[0][1])
+        pooled = [cond[1].get("pooled_output") for cond, _ in encoded]
+        if all(p is not None and p.shape == pooled[0].shape for p in pooled):
+            extras["pooled_output"] = sum(p * weight for p, (_, weight) in zip(pooled, encoded))
+        if any(cond[0].shape[1] != tokens for cond, _ in encoded):
+            extras.pop("attention_mask", None)
+        return [[embedding, extras]]
+
+    def filler_latent(self, vae, length, width, height, vae_batch_mb=0, encode_mode="auto"):
+        """
+        VAE encoding of a full-length clip of neutral gray frames.
+        Computed once per (VAE, length, width, height) and reused across segments and runs.
+        """
+        key = (length, width, height)
+        latent = FILLER_LATENT_CACHE.get(vae, key)
+        if latent is None:
+            latent = self.encode_clips(vae, [(None, None)], length, width, height, vae_batch_mb, encode_mode)[0]
+            FILLER_LATENT_CACHE.put(vae, key, latent)
+        return latent
+
+    def encode_budget(self, vae, vae_batch_mb):
+        """
+        Memory budget in bytes for a single VAE encode call.
+        vae_batch_mb = 0 uses the free memory on the VAE device.
+        """
+        if vae_batch_mb > 0:
+            return vae_batch_mb * 1024 * 1024
+        return comfy.model_management.get_free_memory(getattr(vae, "device", None))
+
+    def clip_memory(self, vae, clip_length, width, height):
+        """
+        Estimated VAE encode memory for one clip, or None if the VAE cannot estimate it.
+        """
+        if not hasattr(vae, "memory_used_encode"):
+            return None
+        return max(1, vae.memory_used_encode((1, 3, clip_length, height, width), vae.vae_dtype))
+
+    def load_vae(self, vae, clip_length, width, height):
+        """
+        Load the VAE to its device for encoding clips of this size. Done before
+        the free memory is measured, which would otherwise still count the
+        memory the weights are about to take (or memory held by other models).
+        """
+        per_clip = self.clip_memory(vae, clip_length, width, height)
+        if per_clip is not None and hasattr(vae, "patcher"):
+            comfy.model_management.load_models_gpu([vae.patcher], memory_required=per_clip)
+
+    def clip_batch_size(self, vae, clip_length, width, height, vae_batch_mb):
+        """
+        Number of segment clips to VAE-encode together within the memory budget.
+        """
+        per_clip = self.clip_memory(vae, clip_length, width, height)
+        if per_clip is None:
+            return 1
+        return max(1, int(self.encode_budget(vae, vae_batch_mb) // per_clip))
+
+    def tile_settings(self, vae, clip_length, width, height, budget):
+        """
+        Pick spatial tile size and temporal chunk length for vae.encode_tiled so
+        that a single tile fits the memory budget. Temporal chunks stay on the
+        4-frame latent stride; spatial tiles are multiples of 32 pixels.
+        """
+        tile_x, tile_y, tile_t = width, height, clip_length
+        while vae.memory_used_encode((1, 3, tile_t, tile_y, tile_x), vae.vae_dtype) > budget:
+            if max(tile_x, tile_y) > SPATIAL_TILE_MIN:
+                # Shrink the larger spatial side first
+                if tile_x >= tile_y:
+                    tile_x = max(SPATIAL_TILE_MIN, (tile_x // 2) // 32 * 32)
+                else:
+                    tile_y = max(SPATIAL_TILE_MIN, (tile_y // 2) // 32 * 32)
+            elif tile_t > TEMPORAL_TILE_MIN:
+                tile_t = max(TEMPORAL_TILE_MIN, (tile_t // 2) // 4 * 4)
+            else:
+                break
+        return {
+            "tile_x": tile_x,
+            "tile_y": tile_y,
+            "overlap": min(SPATIAL_TILE_OVERLAP, tile_x // 4, tile_y // 4),
+            "tile_t": tile_t,
+            "overlap_t": min(TEMPORAL_TILE_OVERLAP, tile_t // 2),
+        }
+
+    def vae_encode_batch(self, vae, pixels, encode_mode="auto", budget=None):
+        """
+        Encode a batch of clips shaped [B, T, H, W, C] to latents [B, C, t, h, w].
+        vae.encode treats a 4D input as a single video, so batches of several clips
+        go through the first stage model directly, the same way vae.encode does.
+        A single clip that does not fit the budget (or encode_mode "tiled") is
+        encoded in spatial tiles and temporal chunks with vae.encode_tiled. A batch
+        that runs out of memory is retried one clip at a time.
+        """
+        if pixels.shape[0] == 1 and encode_mode != "full" and hasattr(vae, "encode_tiled"):
+            clip_length, height, width = pixels.shape[1:4]
+            if budget is None:
+                # Measure free memory with the VAE loaded, not before
+                self.load_vae(vae, clip_length, width, height)
+                budget = self.encode_budget(vae, 0)
+            if encode_mode == "tiled" or self.clip_memory(vae, clip_length, width, height) > budget:
+                return vae.encode_tiled(pixels[0], **self.tile_settings(vae, clip_length, width, height, budget))
+
+        if pixels.shape[0] == 1 or not hasattr(vae, "first_stage_model"):
+            return torch.cat([vae.encode(clip) for clip in pixels], dim=0)
+
+        if hasattr(vae, "throw_exception_if_invalid"):
+            vae.throw_exception_if_invalid()
+        try:
+            batch = pixels.movedim(-1, 1)  # -> [B, C, T, H, W]
+            memory_used = vae.memory_used_encode(batch.shape, vae.vae_dtype)
+            comfy.model_management.load_models_gpu([vae.patcher], memory_required=memory_used)
+            batch = vae.process_input(batch).to(vae.vae_dtype).to(vae.device)
+            return vae.first_stage_model.encode(batch).to(vae.output_device).float()
+        except comfy.model_management.OOM_EXCEPTION:
+            print("Warning: Ran out of memory encoding a batch of clips, retrying clip by clip")
+            batch = None
+            comfy.model_management.soft_empty_cache()
+        # One clip at a time, with vae.encode's own handling (tiled encoding on OOM)
+        return torch.cat([
+            self.vae_encode_batch(vae, pixels[j:j + 1], encode_mode, budget) for j in range(pixels.shape[0])
+        ], dim=0)
+
+    def pixel_placement(self, vae, shape):
+        """
+        dtype and device for building clip pixels: the VAE's dtype, and the VAE's
+        device when the clip takes at most a quarter of its free memory.
+        """
+        dtype = getattr(vae, "vae_dtype", torch.float32)
         device = comfy.model_management.intermediate_device()
+        vae_device = getattr(vae, "device", None)
+        if vae_device is not None and vae_device != device:
+            nbytes = torch.Size(shape).numel() * torch.empty((), dtype=dtype).element_size()
+            if nbytes * 4 <= comfy.model_management.get_free_memory(vae_device):
+                device = vae_device
+        return dtype, device
+
+    def pixel_bytes(self, vae, frames, width, height):
+        """
+        Size in bytes of frames RGB frames built in the VAE's dtype.
+        """
+        dtype = getattr(vae, "vae_dtype", torch.float32)
+        return frames * height * width * 3 * torch.empty((), dtype=dtype).element_size()
+
+    def build_clips(self, vae, boundaries, frames, width, height, first_frame=True, last_frame=True):
+        """
+        Pixels [B, frames, H, W, C] of neutral gray clips. The start frame of each
+        (start_frame, end_frame) entry is placed on the first frame if first_frame,
+        the end frame on the last frame if last_frame.
+        """
+        shape = (len(boundaries), frames, height, width, 3)
+        dtype, device = self.pixel_placement(vae, shape)
+        # Single allocation, directly in the VAE's dtype
+        pixels = torch.full(shape, 0.5, dtype=dtype, device=device)
+        for j, (start_frame, end_frame) in enumerate(boundaries):
+            if first_frame and start_frame is not None:
+                pixels[j, 0] = start_frame[:, :, :3]
+            if last_frame and end_frame is not None:
+                pixels[j, -1] = end_frame[:, :, :3]
+        return pixels
+
+    def chunk_latent_frames(self, vae, width, height, pixel_budget):
+        """
+        Latent frames a temporal chunk adds when its pixels, together with the
+        CAUSAL_ENCODER_CONTEXT latent frames of history encoded before it, must
+        fit pixel_budget. Never fewer than CAUSAL_ENCODER_CONTEXT, so re-encoding
+        the history at most doubles the encode work.
+        """
+        frames = pixel_budget // max(1, self.pixel_bytes(vae, 1, width, height))
+        return max(CAUSAL_ENCODER_CONTEXT, (frames - 1) // 4 + 1 - CAUSAL_ENCODER_CONTEXT)
+
+    def encode_chunked(self, vae, boundary, clip_length, width, height, chunk_latents, encode_mode="auto", budget=None):
+        """
+        VAE-encode a single clip in temporal chunks of chunk_latents latent frames,
+        so that only one chunk's pixels exist at a time. Gray frames are built per
+        chunk; only chunks starting on the first frame carry the start frame and
+        only the last the end frame. Each later chunk is encoded together with the
+        CAUSAL_ENCODER_CONTEXT latent frames before it, whose latents are dropped:
+        that covers the causal encoder's receptive field, so the stitched latent
+        equals the whole-clip encoding.
+        """
+        latent_frames = (clip_length - 1) // 4 + 1
+        latents = []
+        for first in range(0, latent_frames, chunk_latents):
+            last = min(first + chunk_latents, latent_frames)
+            context = min(first, CAUSAL_ENCODER_CONTEXT)
+            begin = first - context
+            # Latent frame k > 0 covers frames 4k - 3 .. 4k, so a chunk starting on frame
+            # 4 * begin is split into the same groups of 4 as the whole clip
+            frames = 4 * (last - 1 - begin) + 1
+            pixels = self.build_clips(
+                vae, [boundary], frames, width, height, first_frame=begin == 0, last_frame=last == latent_frames
+            )
+            encoded = self.vae_encode_batch(vae, pixels, encode_mode, budget)
+            del pixels
+            latents.append(encoded[:, :, context:])
+        return latents[0] if len(latents) == 1 else torch.cat(latents, dim=2)
+
+    def encode_clips(self, vae, boundaries, clip_length, width, height, vae_batch_mb=0, encode_mode="auto"):
+        """
+        VAE-encode clips of clip_length gray frames with an optional start frame
+        (first frame) and end frame (last frame), grouped into batches that fit the
+        memory budget. boundaries is a list of (start_frame, end_frame) [H, W, C]
+        tensors or None. Returns one latent [1, C, t, h, w] per entry.
+
+        The pixels of a batch take at most a quarter of the budget; clips longer
+        than that are built and encoded one at a time in temporal chunks.
+        """
+        self.load_vae(vae, clip_length, width, height)
+        budget = self.encode_budget(vae, vae_batch_mb)
+        pixel_budget = budget // 4
+        clip_bytes = self.pixel_bytes(vae, clip_length, width, height)
+        if clip_bytes > pixel_budget:
+            chunk_latents = self.chunk_latent_frames(vae, width, height, pixel_budget)
+            return [
+                self.encode_chunked(vae, boundary, clip_length, width, height, chunk_latents, encode_mode, budget)
+                for boundary in boundaries
+            ]
+
+        batch_size = min(self.clip_batch_size(vae, clip_length, width, height, vae_batch_mb), pixel_budget // clip_bytes)
+        if encode_mode == "tiled":
+            batch_size = 1
+        latents = []
+        for first in range(0, len(boundaries), batch_size):
+            group = boundaries[first:first + batch_size]
+            pixels = self.build_clips(vae, group, clip_length, width, height)
+            encoded = self.vae_encode_batch(vae, pixels, encode_mode, budget)
+            del pixels
+            if len(group) == 1:
+                latents.append(encoded)
+            else:
+                # Copies: views of the batch would keep all of its latents alive in the segment cache
+                latents.extend(encoded[j:j + 1].clone() for j in range(len(group)))
+        return latents
+
+    def encode_segments(self, vae, frames, segments, length, width, height,
+                        filler_mode="full", filler_context=CAUSAL_ENCODER_CONTEXT, vae_batch_mb=0, encode_mode="auto"):
+        """
+        VAE-encode the clips of the given segment indices: start frame, gray filler
+        frames, end frame. frames maps keyframe index to the keyframe already resized
+        to [height, width, C].
+
+        In "full" mode the whole clip is encoded. In "cached" mode the cached gray
+        filler latent is reused and only short boundary clips are encoded: the
+        start frame followed by filler_context latent frames of gray, and
+        filler_context latent frames of gray followed by the end frame. The
+        context is at least CAUSAL_ENCODER_CONTEXT, which covers the encoder's
+        temporal receptive field, so both modes give the same latents.
+        """
+        filler_context = max(filler_context, CAUSAL_ENCODER_CONTEXT)
+        latent_frames = ((length - 1) // 4) + 1
+        if filler_mode != "cached" or latent_frames <= 2 * filler_context + 1:
+            return self.encode_clips(
+                vae, [(frames[i], frames[i + 1]) for i in segments], length, width, height, vae_batch_mb, encode_mode
+            )
+
+        boundary_length = 4 * filler_context + 1
+        heads = self.encode_clips(
+            vae, [(frames[i], None) for i in segments], boundary_length, width, height, vae_batch_mb, encode_mode
+        )
+        tails = self.encode_clips(
+            vae, [(None, frames[i + 1]) for i in segments], boundary_length, width, height, vae_batch_mb, encode_mode
+        )
+
+        filler = self.filler_latent(vae, length, width, height, vae_batch_mb, encode_mode)
+        latents = []
+        for head_latent, tail_latent in zip(heads, tails):
+            latent = filler.clone()
+            latent[:, :, :filler_context + 1] = head_latent[:, :, :filler_context + 1]
+            latent[:, :, -1:] = tail_latent[:, :, -1:]
+            latents.append(latent)
+        return latents
+
+    def segment_mask(self, concat_latent_image):
+        """
+        Concat mask for a segment latent: the first 4 frames (start keyframe) and the
+        last frame (end keyframe) are known, everything in between is generated.
+        """
+        # Create mask with correct latent dimensions
+        latent_time_dim = concat_latent_image.shape[2]
+        latent_height = concat_latent_image.shape[3]
+        latent_width = concat_latent_image.shape[4]
+        
+        mask = torch.ones((1, 1, latent_time_dim * 4, latent_height, latent_width))
+        
+        start_mask_frames = min(4, latent_time_dim * 4)
+        mask[:, :, :start_mask_frames] = 0.0
+        
+        end_mask_frames = min(1, latent_time_dim * 4)
+        mask[:, :, -end_mask_frames:] = 0.0
+        
+        # Reshape mask to match expected latent format
+        return mask.view(1, mask.shape[2] // 4, 4, mask.shape[3], mask.shape[4]).transpose(1, 2)
+
+    def merge_clip_vision(self, start_cv, end_cv):
+        """
+        Merge the CLIP vision outputs of a segment's start and end keyframe by
+        concatenating their hidden states along the token dimension.
+        """
+        if start_cv is None:
+            return end_cv
+        if end_cv is None:
+            return start_cv
+
+        states = torch.cat([
+            start_cv.penultimate_hidden_states,
+            end_cv.penultimate_hidden_states
+        ], dim=-2)
         
+        clip_vision_output = comfy.clip_vision.Output()
+        clip_vision_output.penultimate_hidden_states = states
+        return clip_vision_output
+
+    def gather_clip_vision(self, clip_vision_pairs):
+        """
+        Stack the merged CLIP vision states of all segments into one preallocated
+        buffer, copying each start/end state straight into its slot.
+        Returns None when no segment has CLIP vision outputs.
+        """
+        parts = [
+            [cv.penultimate_hidden_states for cv in pair if cv is not None]
+            for pair in clip_vision_pairs
+        ]
+        parts = [states for states in parts if states]
+        if not parts:
+            return None
+
+        first = parts[0][0]
+        rows = sum(states[0].shape[0] for states in parts)
+        tokens = sum(part.shape[-2] for part in parts[0])
+        buffer = torch.empty((rows, tokens, first.shape[-1]), dtype=first.dtype, device=first.device)
+
+        row = 0
+        for states in parts:
+            batch = states[0].shape[0]
+            token = 0
+            for part in states:
+                buffer[row:row + batch, token:token + part.shape[-2]] = part
+                token += part.shape[-2]
+            if token != tokens:
+                raise ValueError(f"CLIP vision states have {token} tokens, expected {tokens}")
+            row += batch
+
+        clip_vision_output = comfy.clip_vision.Output()
+        clip_vision_output.penultimate_hidden_states = buffer
+        return clip_vision_output
+
+    def stack_shared(self, concat_latents, masks, clip_vision_pairs, profiler=NULL_PROFILER):
+        """
+        Build the stacked concat latents, masks and CLIP vision output once, so
+        the positive and negative conditioning reference the same tensors.
+        """
+        shared = {}
+
+        with profiler.stage("stack"):
+            if concat_latents:
+                try:
+                    shared["concat_latent_image"] = torch.cat(concat_latents, dim=0)
+                except Exception as e:
+                    print(f"Warning: Could not stack concat latent images: {e}")
+                    # Use the first latent as fallback
+                    shared["concat_latent_image"] = concat_latents[0]
+
+            if masks:
+                if all(mask is masks[0] for mask in masks):
+                    # Identical template for every segment: an expanded view, no copy
+                    shared["concat_mask"] = masks[0].expand(len(masks), *masks[0].shape[1:])
+                else:
+                    shared["concat_mask"] = torch.cat(masks, dim=0)
+
+        if clip_vision_pairs:
+            with profiler.stage("clip_vision"):
+                try:
+                    clip_vision_output = self.gather_clip_vision(clip_vision_pairs)
+                except Exception as e:
+                    print(f"Warning: Could not stack clip vision outputs: {e}")
+                    # Use the first clip vision output as fallback
+                    merged = [self.merge_clip_vision(*pair) for pair in clip_vision_pairs]
+                    clip_vision_output = next((cv for cv in merged if cv is not None), None)
+            if clip_vision_output is not None:
+                shared["clip_vision_output"] = clip_vision_output
+
+        return shared
+
+    def segment_length(self, fps, seconds):
+        """
+        Number of video frames per segment for the given fps and duration.
+        """
         # Calculate length for specified seconds of video
         length = (fps * seconds) + 1  # +1 to ensure we have full second
         # Round to nearest multiple of 4 for compatibility
-        length = ((length - 1) // 4) * 4 + 1
+        return ((length - 1) // 4) * 4 + 1
 
-        # --- Parse prompts by line format ---
-        lines = [line.strip() for line in positive_prompt.split('\n') if line.strip()]
-        if len(lines) == 0:
-            lines = [positive_prompt]
-        
-        indexed_prompts = {} 
-        
-        bracket_pattern = r"^\[(\d+)\]\s*(.+)$"
-        for line in lines:
-            match = re.match(bracket_pattern, line)
-            if match:
-                idx = int(match.group(1))
-                prompt = match.group(2).strip()
-                indexed_prompts[idx] = prompt
+    def empty_latent(self, vae, num_segments, length, width, height):
+        """
+        Zero latent for num_segments segments of the given length and size.
+        """
+        spacial_scale = vae.spacial_compression_encode()
+        return torch.zeros(
+            [num_segments, vae.latent_channels, ((length - 1) // 4) + 1, height // spacial_scale, width // spacial_scale],
+            device=comfy.model_management.intermediate_device()
+        )
+
+    def iter_segments(
+        self, clip, positive_prompt, negative_prompt, vae, width, height, fps, seconds,
+        keyframes=None, clip_vision_outputs=None, filler_mode="full", filler_context=CAUSAL_ENCODER_CONTEXT,
+        vae_batch_mb=0, reuse_segments=True, encode_mode="auto", keyframe_stream=None, profiler=NULL_PROFILER
+    ):
+        """
+        Yields (positive_cond, negative_cond, concat_latent_image, mask, clip_vision_pair)
+        for each segment, in keyframe order. clip_vision_pair holds the CLIP vision
+        outputs of the start and end keyframe (either may be None), see merge_clip_vision.
+        The mask tensor is shared by all segments and must not be modified in place.
+        Keyframes come from keyframes, or from keyframe_stream in windows of
+        STREAM_WINDOW segments, each yielded as soon as its keyframes have arrived.
+        Stage timings are recorded on profiler.
+        """
+        length = self.segment_length(fps, seconds)
+
+        # --- Compile the prompt schedule (cached by text) ---
+        with profiler.stage("parse_prompts"):
+            schedule = compile_schedule(positive_prompt)
+        blends = {}
         
         # --- Process keyframes ---
-        keyframes = self.ensure_batch(keyframes)
-        num_keyframes = keyframes.shape[0] if keyframes is not None and keyframes.shape[0] > 0 else 0
-        
+        if keyframe_stream is not None:
+            if keyframes is not None:
+                raise ValueError("Connect either keyframes or keyframe_stream, not both")
+            num_keyframes = len(keyframe_stream)
+            # Encode segments while later keyframes are still being decoded
+            windows = self.stream_windows(profiler.iterate("stream_wait", keyframe_stream), STREAM_WINDOW)
+        else:
+            keyframes = self.ensure_batch(keyframes)
+            num_keyframes = keyframes.shape[0] if keyframes is not None and keyframes.shape[0] > 0 else 0
+            windows = [(0, keyframes)]
+
         if num_keyframes < 2:
             raise ValueError("At least 2 keyframes are required to create video segments")
         
         num_segments = num_keyframes - 1
-        
-        spacial_scale = vae.spacial_compression_encode()
-        
-        # Prepare storage for stacked latents and conditioning
-        stacked_latent = torch.zeros(
-            [num_segments, vae.latent_channels, ((length - 1) // 4) + 1, height // spacial_scale, width // spacial_scale],
-            device=device
-        )
-        
+        num_encoded = 0
+
+        mask = None
+        for first, window in windows:
+            window_latents, encoded = self.window_latents(
+                vae, window, length, width, height, filler_mode, filler_context, vae_batch_mb,
+                reuse_segments, encode_mode, profiler
+            )
+            num_encoded += encoded
+
+            for i, concat_latent_image in enumerate(window_latents, start=first):
+                # Get the prompt weights for this segment
+                weights = schedule.segment_weights(i, length)
+                if len(weights) == 1:
+                    print(f"[Segment {i}] Using prompt from keyframe {i}: '{weights[0][0][:50]}...'")
+                else:
+                    mix = ", ".join(f"{weight:.0%} '{prompt[:30]}...'" for prompt, weight in weights)
+                    print(f"[Segment {i}] Blending prompts: {mix}")
+                
+                # Encode positive and negative prompts for this segment
+                with profiler.stage("text_encode"):
+                    if weights not in blends:
+                        blends[weights] = self.blend_text(clip, weights)
+                    positive_cond = blends[weights]
+                    negative_cond = self.encode_text(clip, negative_prompt)
+                
+                # All segments share one mask template (latents have identical shapes)
+                if mask is None or mask.shape[2:] != concat_latent_image.shape[2:]:
+                    mask = self.segment_mask(concat_latent_image)
+
+                # CLIP vision outputs of the start and end keyframe, if provided
+                clip_vision_pair = (None, None)
+                if clip_vision_outputs is not None and hasattr(clip_vision_outputs, '__len__'):
+                    clip_vision_pair = (
+                        clip_vision_outputs[i] if len(clip_vision_outputs) > i else None,
+                        clip_vision_outputs[i + 1] if len(clip_vision_outputs) > i + 1 else None,
+                    )
+
+                yield positive_cond, negative_cond, concat_latent_image, mask, clip_vision_pair
+
+        print(f"[WanKeyframeToVideo] Encoded {num_encoded} of {num_segments} segments, reused {num_segments - num_encoded}")
+        profiler.note(segments=num_segments, encoded=num_encoded, length=length, width=width, height=height)
+
+    def stream_windows(self, keyframe_stream, window):
+        """
+        Group streamed keyframes into batches covering up to window segments.
+        Yields (first, keyframes): the index of the first keyframe and a
+        [N, H, W, C] tensor. Consecutive batches share their boundary keyframe.
+        """
+        frames = []
+        first = 0
+        for frame in keyframe_stream:
+            frames.append(frame)
+            if len(frames) == window + 1:
+                yield first, torch.stack(frames)
+                first += window
+                frames = frames[-1:]
+        if len(frames) > 1:
+            yield first, torch.stack(frames)
+
+    def window_latents(
+        self, vae, keyframes, length, width, height, filler_mode="full", filler_context=CAUSAL_ENCODER_CONTEXT,
+        vae_batch_mb=0, reuse_segments=True, encode_mode="auto", profiler=NULL_PROFILER
+    ):
+        """
+        Concat latents of the segments between consecutive keyframes [N, H, W, C].
+        Returns (latents, encoded): N - 1 latents and the number actually encoded
+        (the others come from the segment cache).
+        """
+        num_segments = keyframes.shape[0] - 1
+
+        # Look up segments whose keyframes, size, length and VAE are unchanged since a previous run
+        segment_latents = [None] * num_segments
+        segment_keys = [None] * num_segments
+        if reuse_segments:
+            with profiler.stage("segment_cache"):
+                digests = [self.frame_digest(keyframes[k]) for k in range(num_segments + 1)]
+                for i in range(num_segments):
+                    segment_keys[i] = (
+                        digests[i], digests[i + 1], length, width, height, filler_mode, filler_context, encode_mode
+                    )
+                    segment_latents[i] = SEGMENT_LATENT_CACHE.get(vae, segment_keys[i])
+        dirty = [i for i in range(num_segments) if segment_latents[i] is None]
+
+        if dirty:
+            # Upscale the needed keyframes at once: [N, H, W, C] -> [N, C, H, W] -> upscale -> [N, height, width, C]
+            # Each boundary keyframe is shared by two segments, so it is only resized once
+            needed = sorted(set(dirty) | set(i + 1 for i in dirty))
+            with profiler.stage("upscale"):
+                if keyframes.shape[1:3] == (height, width):
+                    # Already at the target size (e.g. resized by the loader): no second resize pass
+                    upscaled = keyframes[needed]
+                else:
+                    upscaled = comfy.utils.common_upscale(
+                        keyframes[needed].movedim(-1, 1),
+                        width, height, "bilinear", "center"
+                    ).movedim(1, -1)
+            frames = dict(zip(needed, upscaled))
+
+            # Encode start frame, gray filler and end frame of dirty segments in memory-bounded batches
+            with profiler.stage("vae_encode"):
+                encoded = self.encode_segments(
+                    vae, frames, dirty, length, width, height,
+                    filler_mode, filler_context, vae_batch_mb, encode_mode
+                )
+            for i, latent in zip(dirty, encoded):
+                segment_latents[i] = latent
+                if reuse_segments:
+                    SEGMENT_LATENT_CACHE.put(vae, segment_keys[i], latent)
+
+        return segment_latents, len(dirty)
+
+    def encode(
+        self, clip, positive_prompt, negative_prompt, vae, width, height, fps, seconds,
+        keyframes=None, clip_vision_outputs=None, filler_mode="full", filler_context=CAUSAL_ENCODER_CONTEXT,
+        vae_batch_mb=0, reuse_segments=True, encode_mode="auto", profile=False, keyframe_stream=None
+    ):
+        profiler = StageProfiler("WanKeyframeToVideo", enabled=profile)
         stacked_positive_cond = []
         stacked_negative_cond = []
         stacked_concat_latents = []
         stacked_masks = []
-        stacked_clip_vision_outputs = []
-        
-        for i in range(num_segments):
-            # Extract frames - keyframes are already in [N, H, W, C] format after ensure_batch
-            start_frame = keyframes[i:i+1]  # [1, H, W, C]
-            end_frame = keyframes[i+1:i+2]  # [1, H, W, C]
-            
-            # Upscale frames: [1, H, W, C] -> [1, C, H, W] -> upscale -> [1, C, height, width]
-            start_frame = comfy.utils.common_upscale(
-                start_frame.movedim(-1, 1), 
-                width, height, "bilinear", "center"
-            ).movedim(1, -1)  # -> [1, height, width, C]
-            
-            end_frame = comfy.utils.common_upscale(
-                end_frame.movedim(-1, 1), 
-                width, height, "bilinear", "center"
-            ).movedim(1, -1)  # -> [1, height, width, C]
-            
-            # Get the prompt for this segment
-            if i in indexed_prompts:
-                formatted_positive = indexed_prompts[i]
-            elif 0 in indexed_prompts:
-                formatted_positive = indexed_prompts[0]
-            else:
-                formatted_positive = lines[0] if lines else positive_prompt
-            
-            print(f"[Segment {i}] Using prompt from keyframe {i}: '{formatted_positive[:50]}...'")
-            
-            # Encode positive and negative prompts for this segment
-            positive_cond = nodes.CLIPTextEncode().encode(clip=clip, text=formatted_positive)[0]
-            negative_cond = nodes.CLIPTextEncode().encode(clip=clip, text=negative_prompt)[0]
-            
-            # Create image tensor with start and end frames
-            image = torch.ones((length, height, width, 3)) * 0.5
+        stacked_clip_vision_pairs = []
 
-            image[0:1] = start_frame
-            image[-1:] = end_frame
-            
-            concat_latent_image = vae.encode(image[:, :, :, :3])
-            
-            # Create mask with correct latent dimensions
-            latent_time_dim = concat_latent_image.shape[2]
-            latent_height = concat_latent_image.shape[3]
-            latent_width = concat_latent_image.shape[4]
-            
-            mask = torch.ones((1, 1, latent_time_dim * 4, latent_height, latent_width))
-            
-            start_mask_frames = min(4, latent_time_dim * 4)
-            mask[:, :, :start_mask_frames] = 0.0
-            
-            end_mask_frames = min(1, latent_time_dim * 4)
-            mask[:, :, -end_mask_frames:] = 0.0
-            
-            # Reshape mask to match expected latent format
-            mask = mask.view(1, mask.shape[2] // 4, 4, mask.shape[3], mask.shape[4]).transpose(1, 2)
-            
+        for positive_cond, negative_cond, concat_latent_image, mask, clip_vision_pair in self.iter_segments(
+            clip, positive_prompt, negative_prompt, vae, width, height, fps, seconds,
+            keyframes, clip_vision_outputs, filler_mode, filler_context, vae_batch_mb, reuse_segments, encode_mode,
+            keyframe_stream=keyframe_stream, profiler=profiler
+        ):
             # Store for stacking
-            stacked_concat_latents.append(concat_latent_image)
-            stacked_masks.append(mask)
-            
-            # Handle CLIP vision if provided
-            clip_vision_output = None
-            
-            if clip_vision_outputs is not None:
-                if hasattr(clip_vision_outputs, '__len__') and len(clip_vision_outputs) > i:
-                    clip_vision_output = clip_vision_outputs[i]
-                
-                if hasattr(clip_vision_outputs, '__len__') and len(clip_vision_outputs) > i + 1:
-                    end_cv = clip_vision_outputs[i + 1]
-                    
-                    if clip_vision_output is not None:
-                        # Merge start and end clip vision outputs
-                        states = torch.cat([
-                            clip_vision_output.penultimate_hidden_states,
-                            end_cv.penultimate_hidden_states
-                        ], dim=-2)
-                        
-                        clip_vision_output = comfy.clip_vision.Output()
-                        clip_vision_output.penultimate_hidden_states = states
-                    else:
-                        clip_vision_output = end_cv
-            
-            stacked_clip_vision_outputs.append(clip_vision_output)
             stacked_positive_cond.append(positive_cond)
             stacked_negative_cond.append(negative_cond)
+            stacked_concat_latents.append(concat_latent_image)
+            stacked_masks.append(mask)
+            stacked_clip_vision_pairs.append(clip_vision_pair)
+
+        # Prepare the stacked latent for all segments
+        stacked_latent = self.empty_latent(
+            vae, len(stacked_concat_latents), self.segment_length(fps, seconds), width, height
+        )
         
+        # Stack the image conditioning once; positive and negative share the same tensors
+        shared = self.stack_shared(stacked_concat_latents, stacked_masks, stacked_clip_vision_pairs, profiler)
+        del stacked_concat_latents
+
         # Stack all conditioning data
-        final_positive_cond = self._stack_conditioning(
-            stacked_positive_cond, stacked_concat_latents, stacked_masks, stacked_clip_vision_outputs
-        )
-        final_negative_cond = self._stack_conditioning(
-            stacked_negative_cond, stacked_concat_latents, stacked_masks, stacked_clip_vision_outputs
-        )
+        with profiler.stage("stack"):
+            final_positive_cond = self._stack_conditioning(stacked_positive_cond, shared=shared)
+            final_negative_cond = self._stack_conditioning(stacked_negative_cond, shared=shared)
         
-        return (final_positive_cond, final_negative_cond, {"samples": stacked_latent})
+        return (final_positive_cond, final_negative_cond, {"samples": stacked_latent}, profiler.emit())
     
-    def _stack_conditioning(self, cond_list, concat_latents, masks, clip_vision_outputs):
+    def _stack_conditioning(self, cond_list, concat_latents=None, masks=None, clip_vision_outputs=None, shared=None):
         """
-        Stack conditioning data from multiple segments into a single conditioning tensor
+        Stack conditioning data from multiple segments into a single conditioning tensor.
+        When shared (see stack_shared) is given, its already stacked concat latents,
+        masks and CLIP vision output are referenced instead of being stacked again.
         """
         if not cond_list:
             return []
@@ -241,6 +751,10 @@ class WanKeyframeToVideo:
                 if len(pooled_outputs) > 0:
                     conditioning_dict["pooled_output"] = pooled_outputs[0]
         
+        if shared is not None:
+            conditioning_dict.update(shared)
+            return [[stacked_embeddings, conditioning_dict]]
+
         # Stack concat latent images
         if concat_latents:
             try:
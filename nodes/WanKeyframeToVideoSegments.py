@@ -0,0 +1,60 @@
+import comfy.clip_vision
+
+from .WanKeyframeToVideo import WanKeyframeToVideo, CAUSAL_ENCODER_CONTEXT
+from .stage_profiler import StageProfiler
+
+
+class WanKeyframeToVideoSegments(WanKeyframeToVideo):
+    """
+    List-output variant of WanKeyframeToVideo: one (positive, negative, latent)
+    per segment instead of a single stacked batch. Downstream samplers run once
+    per segment, so sampling memory is bounded by a single segment.
+    """
+
+    RETURN_TYPES = ("CONDITIONING", "CONDITIONING", "LATENT", "STRING")
+    RETURN_NAMES = ("positive", "negative", "latent", "profile")
+    FUNCTION = "encode_list"
+    CATEGORY = "conditioning/video_models"
+    OUTPUT_IS_LIST = (True, True, True, False)
+
+    def segment_shared(self, concat_latent, mask, clip_vision_output):
+        """
+        The concat latent, mask and CLIP vision output of a single segment, added
+        to its conditioning. Unlike stack_shared there is nothing to stack, so
+        the segment's own tensors are referenced directly.
+        """
+        shared = {"concat_latent_image": concat_latent, "concat_mask": mask}
+        if clip_vision_output is not None:
+            output = comfy.clip_vision.Output()
+            output.penultimate_hidden_states = clip_vision_output.penultimate_hidden_states
+            shared["clip_vision_output"] = output
+        return shared
+
+    def encode_list(
+        self, clip, positive_prompt, negative_prompt, vae, width, height, fps, seconds,
+        keyframes=None, clip_vision_outputs=None, filler_mode="full", filler_context=CAUSAL_ENCODER_CONTEXT,
+        vae_batch_mb=0, reuse_segments=True, encode_mode="auto", profile=False, keyframe_stream=None
+    ):
+        profiler = StageProfiler("WanKeyframeToVideoSegments", enabled=profile)
+        length = self.segment_length(fps, seconds)
+
+        positive_list = []
+        negative_list = []
+        latent_list = []
+
+        # No stacked copies: each segment's tensors are referenced by both its positive and negative conditioning
+        for positive_cond, negative_cond, concat_latent_image, mask, clip_vision_pair in self.iter_segments(
+            clip, positive_prompt, negative_prompt, vae, width, height, fps, seconds,
+            keyframes, clip_vision_outputs, filler_mode, filler_context, vae_batch_mb, reuse_segments, encode_mode,
+            keyframe_stream=keyframe_stream, profiler=profiler
+        ):
+            with profiler.stage("clip_vision"):
+                clip_vision_output = self.merge_clip_vision(*clip_vision_pair)
+            with profiler.stage("stack"):
+                shared = self.segment_shared(concat_latent_image, mask, clip_vision_output)
+                # A single segment needs no torch.cat: its (memoized) embedding and pooled output are referenced as is
+                positive_list.append([[positive_cond[0][0], {**positive_cond[0][1], **shared}]])
+                negative_list.append([[negative_cond[0][0], {**negative_cond[0][1], **shared}]])
+            latent_list.append({"samples": self.empty_latent(vae, 1, length, width, height)})
+
+        return (positive_list, negative_list, latent_list, profiler.emit())
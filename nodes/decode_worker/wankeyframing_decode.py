@@ -0,0 +1,144 @@
+"""
+Keyframe decoding and resizing with PIL, shared by LoadImagesFromDirectory and
+its decode worker processes.
+
+This module only depends on PIL and numpy and has no package-relative imports,
+so a freshly started worker process (spawn or forkserver) can import it by its
+top-level name. ComfyUI imports the extension itself under a path-like module
+name that such workers could not import.
+"""
+import io
+import math
+
+import numpy as np
+from PIL import Image
+
+
+def crop_box(original_width, original_height, target_width, target_height):
+    """
+    Centered (left, top, right, bottom) box with the target aspect ratio.
+    """
+    # Crop to fit target dimensions maintaining aspect ratio
+    original_aspect = original_width / original_height
+    target_aspect = target_width / target_height
+
+    if original_aspect > target_aspect:
+        # Image is wider, crop width
+        new_width = int(original_height * target_aspect)
+        left = (original_width - new_width) // 2
+        return left, 0, left + new_width, original_height
+
+    # Image is taller, crop height
+    new_height = int(original_width / target_aspect)
+    top = (original_height - new_height) // 2
+    return 0, top, original_width, top + new_height
+
+
+def draft_size(source_size, target_width, target_height, resize_mode, prescale_margin):
+    """
+    Smallest full-image size that still leaves prescale_margin times the target
+    resolution for the final resample. Returns None when no reduction is possible.
+    """
+    source_width, source_height = source_size
+    if resize_mode == "stretch":
+        scale_x = target_width / source_width
+        scale_y = target_height / source_height
+    else:
+        # fit is bounded by the tighter axis, crop by the looser one
+        pick = min if resize_mode == "fit" else max
+        scale_x = scale_y = pick(target_width / source_width, target_height / source_height)
+
+    draft_width = math.ceil(source_width * scale_x * prescale_margin)
+    draft_height = math.ceil(source_height * scale_y * prescale_margin)
+    if draft_width >= source_width and draft_height >= source_height:
+        return None
+    return (draft_width, draft_height)
+
+
+def resize_image(pil_img, target_width, target_height, resize_mode, prescale_margin=0.0):
+    """
+    Resize PIL image to target dimensions based on resize mode.
+    When prescale_margin > 0, the image is first shrunk by an integer factor with
+    reduce() while staying at least prescale_margin times larger than the final
+    size, then finished with LANCZOS. A margin of 0 always resamples from full resolution.
+    """
+    original_width, original_height = pil_img.size
+    reducing_gap = prescale_margin if prescale_margin and prescale_margin >= 1.0 else None
+
+    if resize_mode == "stretch":
+        # Simple stretch to exact dimensions
+        return pil_img.resize((target_width, target_height), Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+
+    elif resize_mode == "fit":
+        # Fit image inside target dimensions maintaining aspect ratio
+        pil_img.thumbnail((target_width, target_height), Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+
+        # Create a new image with target dimensions and paste the resized image centered
+        new_img = Image.new("RGB", (target_width, target_height), (0, 0, 0))
+        paste_x = (target_width - pil_img.width) // 2
+        paste_y = (target_height - pil_img.height) // 2
+        new_img.paste(pil_img, (paste_x, paste_y))
+        return new_img
+
+    elif resize_mode == "crop":
+        cropped = pil_img.crop(crop_box(original_width, original_height, target_width, target_height))
+        # Crop first: resampling from a box would also read pixels outside it at the borders
+        return cropped.resize((target_width, target_height), Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+
+    return pil_img
+
+
+def finish_image(im, target_width, target_height, resize_mode, prescale_margin=0.0, resize_backend="pil"):
+    """
+    Convert an opened image or container frame to RGB and resize it.
+    Returns a uint8 array shaped (H, W, 3). With a torch resize backend the
+    image is only pre-shrunk (see prescale_margin) and resized later in batches.
+    """
+    im = im.convert("RGB")
+
+    if resize_backend != "pil":
+        size = None
+        if prescale_margin and prescale_margin >= 1.0:
+            size = draft_size(im.size, target_width, target_height, resize_mode, prescale_margin)
+        if size is not None:
+            factor = min(im.width // size[0], im.height // size[1])
+            if factor >= 2:
+                im = im.reduce(factor)
+        return np.array(im)
+
+    # Resize image to target dimensions
+    im = resize_image(im, target_width, target_height, resize_mode, prescale_margin)
+
+    return np.array(im)
+
+
+def decode_image(fpath, target_width, target_height, resize_mode, prescale_margin=0.0, resize_backend="pil"):
+    """
+    Open, convert and resize a single image file (a path or a file object).
+    Returns a uint8 array shaped (H, W, 3).
+    """
+    with Image.open(fpath) as im:
+        if prescale_margin and prescale_margin >= 1.0:
+            # JPEG draft mode decodes at 1/2, 1/4 or 1/8 scale directly (no-op for other formats)
+            size = draft_size(im.size, target_width, target_height, resize_mode, prescale_margin)
+            if size is not None:
+                im.draft(im.mode, size)
+
+        return finish_image(im, target_width, target_height, resize_mode, prescale_margin, resize_backend)
+
+
+def decode_file(fpath, target_width, target_height, resize_mode, prescale_margin, resize_backend):
+    """
+    Pool entry point (picklable by reference for process pools).
+    fpath is a file path or the encoded bytes of an archive entry.
+    """
+    if isinstance(fpath, bytes):
+        fpath = io.BytesIO(fpath)
+    return decode_image(fpath, target_width, target_height, resize_mode, prescale_margin, resize_backend)
+
+
+def finish_frame(frame, target_width, target_height, resize_mode, prescale_margin, resize_backend):
+    """
+    Pool entry point for frames of a multi-frame image (already decoded to RGB).
+    """
+    return finish_image(frame, target_width, target_height, resize_mode, prescale_margin, resize_backend)
@@ -0,0 +1,114 @@
+import os
+import json
+import hashlib
+import threading
+
+from .keyframe_cache import cache_directory
+
+MANIFEST_DIR = cache_directory("manifests")
+
+
+class DirectoryIndex:
+    """
+    Per-directory manifest of file names, keyed on the directory's mtime.
+
+    Adding, removing or renaming files changes the directory mtime, so an
+    unchanged mtime means the listing can be reused without scanning. The
+    manifest is kept in memory and mirrored as JSON under manifest_dir so it
+    survives restarts. In-place edits of a file do not change the directory
+    mtime; callers must stat the files they actually use.
+    """
+
+    def __init__(self, manifest_dir=MANIFEST_DIR):
+        self.manifest_dir = manifest_dir
+        self._manifests = {}
+        self._lock = threading.Lock()
+
+    def _manifest_path(self, full_dir):
+        digest = hashlib.sha1(os.path.abspath(full_dir).encode("utf-8")).hexdigest()
+        return os.path.join(self.manifest_dir, digest + ".json")
+
+    def scan(self, full_dir, extensions):
+        """
+        Return (names, stats) for non-hidden files in full_dir with one of the given
+        extensions, in directory order. stats maps name -> os.stat_result for files
+        whose stat data came from this scan (empty when the manifest was reused).
+        """
+        full_dir = os.path.abspath(full_dir)
+        dir_mtime = os.stat(full_dir).st_mtime_ns
+        key = (dir_mtime, tuple(extensions))
+
+        with self._lock:
+            cached = self._manifests.get(full_dir)
+        if cached is not None and cached[0] == key:
+            return cached[1], {}
+
+        names = self._load_manifest(full_dir, dir_mtime, extensions)
+        if names is not None:
+            with self._lock:
+                self._manifests[full_dir] = (key, names)
+            return names, {}
+
+        names = []
+        stats = {}
+        with os.scandir(full_dir) as it:
+            for entry in it:
+                # skip hidden entries
+                if entry.name.startswith("."):
+                    continue
+                if not entry.name.lower().endswith(extensions):
+                    # not a supported extension
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    # DirEntry caches its stat result (free on Windows, one call elsewhere)
+                    stats[entry.name] = entry.stat()
+                except OSError:
+                    pass
+                names.append(entry.name)
+
+        with self._lock:
+            self._manifests[full_dir] = (key, names)
+        self._save_manifest(full_dir, dir_mtime, extensions, names)
+        return names, stats
+
+    def _load_manifest(self, full_dir, dir_mtime, extensions):
+        try:
+            with open(self._manifest_path(full_dir), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("directory") != full_dir or data.get("mtime_ns") != dir_mtime:
+            return None
+        if data.get("extensions") != list(extensions):
+            return None
+        return data.get("names")
+
+    def _save_manifest(self, full_dir, dir_mtime, extensions, names):
+        path = self._manifest_path(full_dir)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.manifest_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "directory": full_dir,
+                    "mtime_ns": dir_mtime,
+                    "extensions": list(extensions),
+                    "names": names,
+                }, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write directory manifest: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._manifests.clear()
+
+
+# Shared between executions so unchanged directories are not listed again
+DIRECTORY_INDEX = DirectoryIndex()
@@ -0,0 +1,181 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import folder_paths
+
+# Default budgets for the decoded keyframe cache
+MEMORY_CACHE_BYTES = 1024 * 1024 * 1024
+DISK_CACHE_BYTES = 2048 * 1024 * 1024
+# Trimming the disk tier frees space down to this fraction of its budget
+DISK_TRIM_RATIO = 0.9
+
+
+def cache_directory(name):
+    """
+    Directory for persistent cache data, under ComfyUI's user directory
+    (the temp directory on versions without one) rather than the extension folder.
+    """
+    get_base_directory = getattr(folder_paths, "get_user_directory", None) or folder_paths.get_temp_directory
+    return os.path.join(get_base_directory(), "wankeyframing", name)
+
+
+DISK_CACHE_DIR = cache_directory("keyframes")
+
+
+def make_cache_key(fpath, stat_result, *params):
+    """
+    Build a cache key for a decoded and resized image.
+    The key changes whenever the file is modified (mtime/size) or the
+    resize parameters differ, so stale entries are never returned.
+    Container entries pass an EntryStat, whose checksum is part of the key.
+    """
+    checksum = getattr(stat_result, "checksum", None)
+    return (os.path.abspath(fpath), stat_result.st_mtime_ns, stat_result.st_size, checksum) + tuple(params)
+
+
+class DecodedImageCache:
+    """
+    Two-tier cache of resized keyframes stored as uint8 arrays (H, W, 3).
+
+    The memory tier is an LRU bounded by a byte budget. The optional disk tier
+    stores .npy files in disk_dir, bounded by its own byte budget and evicted
+    by least recent access (file mtime is refreshed on every hit). Its size is
+    tracked as entries are written; the directory is only scanned once, and
+    again when the budget is exceeded.
+    """
+
+    def __init__(self, max_bytes=MEMORY_CACHE_BYTES, disk_dir=DISK_CACHE_DIR, disk_max_bytes=DISK_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = None
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, digest + ".npy")
+
+    def get(self, key, use_disk=False):
+        with self._lock:
+            arr = self._entries.get(key)
+            if arr is not None:
+                self._entries.move_to_end(key)
+                return arr
+
+        if not use_disk:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            arr = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+
+        self._put_memory(key, arr)
+        return arr
+
+    def put(self, key, arr, use_disk=False):
+        self._put_memory(key, arr)
+        if use_disk and self.disk_max_bytes > 0:
+            self._put_disk(key, arr)
+
+    def _put_memory(self, key, arr):
+        if arr.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.nbytes
+            self._entries[key] = arr
+            self._bytes += arr.nbytes
+            # Evict least recently used entries until we are within budget
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+
+    def _put_disk(self, key, arr):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            replaced = os.stat(path).st_size
+        except OSError:
+            replaced = 0
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                np.save(f, arr, allow_pickle=False)
+                written = f.tell()
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: Could not write keyframe cache entry: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        scanned = None
+        if self._disk_bytes is None:
+            # First write since startup: measure what earlier sessions left behind
+            scanned = sum(size for _, size, _ in self._scan_disk())
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = scanned
+            else:
+                self._disk_bytes += written - replaced
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._trim_disk()
+
+    def _scan_disk(self):
+        """
+        (mtime, size, path) of every .npy file of the disk tier.
+        """
+        entries = []
+        try:
+            with os.scandir(self.disk_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".npy"):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def _trim_disk(self):
+        """
+        Delete the least recently used .npy files until the disk tier is back
+        below DISK_TRIM_RATIO of its budget, so trims stay infrequent.
+        """
+        entries = sorted(self._scan_disk())
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_max_bytes * DISK_TRIM_RATIO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Shared between executions so unchanged keyframes are never decoded twice
+DECODED_IMAGE_CACHE = DecodedImageCache()
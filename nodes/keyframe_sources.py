@@ -0,0 +1,214 @@
+import os
+import mmap
+import time
+import zlib
+import struct
+import tarfile
+import zipfile
+import threading
+from collections import OrderedDict, namedtuple
+
+from PIL import Image
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar")
+MULTIFRAME_EXTENSIONS = (".tif", ".tiff", ".gif", ".webp")
+# Number of container listings kept in memory
+MAX_CONTAINERS = 32
+
+# Stat-like record of a container entry, accepted wherever an os.stat_result is used.
+# checksum is the entry's own checksum (zip CRC, tar header checksum) or None for frames.
+EntryStat = namedtuple("EntryStat", ["st_mtime", "st_mtime_ns", "st_size", "checksum"])
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4s22xHH")
+
+
+def is_container(path):
+    """
+    True when path is a single file holding many keyframes: a .zip/.tar archive
+    or a multi-frame TIFF, GIF or WebP.
+    """
+    return path.lower().endswith(ARCHIVE_EXTENSIONS + MULTIFRAME_EXTENSIONS) and os.path.isfile(path)
+
+
+class KeyframeContainer:
+    """
+    Listing of the images inside one archive or multi-frame image.
+
+    names are the entry names in storage order (frames are named frame_000000,
+    frame_000001, ...), stats maps name -> EntryStat. Archive entries carry their
+    own modification time and size; frames share the container's, so date and
+    size sorting keep frame order.
+    """
+
+    def __init__(self, path, extensions):
+        self.path = path
+        self.is_archive = path.lower().endswith(ARCHIVE_EXTENSIONS)
+        self.names = []
+        self.stats = {}
+        self._locations = {}
+
+        if path.lower().endswith(".zip"):
+            self._list_zip(extensions)
+        elif self.is_archive:
+            self._list_tar(extensions)
+        else:
+            self._list_frames()
+
+    def _add(self, name, stat_result, location, extensions):
+        base = name.rsplit("/", 1)[-1]
+        # skip hidden entries and macOS resource forks
+        if not base or base.startswith(".") or name.startswith("__MACOSX/"):
+            return
+        if not base.lower().endswith(extensions):
+            return
+        self.names.append(name)
+        self.stats[name] = stat_result
+        self._locations[name] = location
+
+    def _list_zip(self, extensions):
+        with zipfile.ZipFile(self.path) as archive:
+            infos = sorted(archive.infolist(), key=lambda info: info.header_offset)
+        for info in infos:
+            if info.is_dir():
+                continue
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            self._add(info.filename, EntryStat(mtime, int(mtime * 1e9), info.file_size, info.CRC), info, extensions)
+
+    def _list_tar(self, extensions):
+        try:
+            with tarfile.open(self.path, mode="r:") as archive:
+                members = archive.getmembers()
+        except tarfile.ReadError as e:
+            raise ValueError(f"Unsupported archive {os.path.basename(self.path)} (only uncompressed .tar): {e}")
+        for member in members:
+            if not member.isfile():
+                continue
+            stat_result = EntryStat(member.mtime, int(member.mtime * 1e9), member.size, member.chksum)
+            self._add(member.name, stat_result, (member.offset_data, member.size), extensions)
+
+    def _list_frames(self):
+        st = os.stat(self.path)
+        with Image.open(self.path) as im:
+            n_frames = getattr(im, "n_frames", 1)
+        for index in range(n_frames):
+            name = f"frame_{index:06d}"
+            self.names.append(name)
+            self.stats[name] = EntryStat(st.st_mtime, st.st_mtime_ns, st.st_size, None)
+            self._locations[name] = index
+
+    def iter_entries(self, names):
+        """
+        Read the given entries through a single file handle, in storage order.
+        Yields (position, source) where position indexes into names. Archive
+        sources are the encoded bytes of the entry, frame sources are RGB PIL images.
+        """
+        order = sorted(range(len(names)), key=lambda pos: self._order_key(names[pos]))
+        if self.is_archive:
+            yield from self._iter_archive(names, order)
+        else:
+            yield from self._iter_frames(names, order)
+
+    def _order_key(self, name):
+        location = self._locations[name]
+        if isinstance(location, zipfile.ZipInfo):
+            return location.header_offset
+        if isinstance(location, tuple):
+            return location[0]
+        return location
+
+    def _iter_archive(self, names, order):
+        if not order:
+            return
+        with open(self.path, "rb") as f:
+            # Entries are sliced straight out of the mapped file: no per-entry seek or read calls
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                fallback = None
+                for pos in order:
+                    name = names[pos]
+                    location = self._locations[name]
+                    try:
+                        if isinstance(location, zipfile.ZipInfo):
+                            data = self._read_zip_entry(mapped, location)
+                            if data is None:
+                                # bzip2/lzma entries go through zipfile on the same handle
+                                if fallback is None:
+                                    fallback = zipfile.ZipFile(f)
+                                data = fallback.read(location)
+                        else:
+                            offset, size = location
+                            data = mapped[offset:offset + size]
+                    except Exception as e:
+                        raise RuntimeError(f"Failed to read {name} from {os.path.basename(self.path)}: {str(e)}")
+                    yield pos, data
+
+    def _read_zip_entry(self, mapped, info):
+        """
+        Return the decompressed bytes of a stored or deflated zip entry, or None
+        for other compression methods.
+        """
+        if info.flag_bits & 0x1:
+            raise RuntimeError("encrypted entries are not supported")
+        if info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            return None
+
+        signature, name_length, extra_length = _ZIP_LOCAL_HEADER.unpack_from(mapped, info.header_offset)
+        if signature != b"PK\x03\x04":
+            raise RuntimeError("bad local file header")
+        start = info.header_offset + _ZIP_LOCAL_HEADER.size + name_length + extra_length
+        data = mapped[start:start + info.compress_size]
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        if zlib.crc32(data) != info.CRC:
+            raise RuntimeError("CRC mismatch")
+        return data
+
+    def _iter_frames(self, names, order):
+        with Image.open(self.path) as im:
+            for pos in order:
+                name = names[pos]
+                try:
+                    im.seek(self._locations[name])
+                    # convert() copies the frame, so the next seek cannot change it
+                    frame = im.convert("RGB")
+                except Exception as e:
+                    raise RuntimeError(f"Failed to read {name} from {os.path.basename(self.path)}: {str(e)}")
+                yield pos, frame
+
+
+class ContainerIndex:
+    """
+    Keeps container listings in memory, keyed on the container's mtime and size,
+    so an unchanged archive is not listed again on the next execution.
+    """
+
+    def __init__(self, max_entries=MAX_CONTAINERS):
+        self.max_entries = max_entries
+        self._containers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, extensions):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        key = (st.st_mtime_ns, st.st_size, tuple(extensions))
+
+        with self._lock:
+            cached = self._containers.get(path)
+            if cached is not None and cached[0] == key:
+                self._containers.move_to_end(path)
+                return cached[1]
+
+        container = KeyframeContainer(path, extensions)
+        with self._lock:
+            self._containers[path] = (key, container)
+            self._containers.move_to_end(path)
+            while len(self._containers) > self.max_entries:
+                self._containers.popitem(last=False)
+        return container
+
+    def clear(self):
+        with self._lock:
+            self._containers.clear()
+
+
+# Shared between executions so unchanged containers are not listed again
+CONTAINER_INDEX = ContainerIndex()
@@ -0,0 +1,95 @@
+import queue
+import threading
+
+import torch
+
+# Seconds between checks for a closed consumer while the queue is full
+_PUT_TIMEOUT = 0.1
+
+
+class KeyframeStream:
+    """
+    Keyframes of a LoadKeyframeStream node, decoded on a background thread
+    while the consumer works on earlier ones.
+
+    Iterating yields one [H, W, 3] keyframe tensor at a time, in index order,
+    with the same values as the corresponding row of LoadImagesFromDirectory's
+    batch. At most prefetch decoded keyframes wait in the queue; keyframes of
+    an archive sorted other than by storage order are held until their turn.
+    The stream can be iterated more than once (ComfyUI caches node outputs):
+    each iteration loads the files again, through the decoded image cache.
+    """
+
+    def __init__(self, loader, full_dir, file_paths, stats, width, height, dtype, prefetch=8, **load_args):
+        self.loader = loader
+        self.full_dir = full_dir
+        self.file_paths = file_paths
+        self.stats = stats
+        self.width = width
+        self.height = height
+        self.dtype = dtype
+        self.prefetch = prefetch
+        self.load_args = load_args
+
+    def __len__(self):
+        return len(self.file_paths)
+
+    def to_keyframe(self, arr):
+        """
+        uint8 (H, W, 3) array -> normalized keyframe tensor, as in the loader's batch.
+        """
+        frame = torch.empty((1, self.height, self.width, 3), dtype=self.dtype)
+        self.loader.write_slot(frame, 0, arr)
+        return frame[0].div_(255.0)
+
+    def __iter__(self):
+        results = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=_PUT_TIMEOUT)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            images = self.loader.iter_images(
+                self.full_dir, self.file_paths, self.stats, self.width, self.height, resize_chunk=1,
+                **self.load_args
+            )
+            try:
+                for idx, arr in images:
+                    if not put((idx, self.to_keyframe(arr))):
+                        return
+            except BaseException as e:
+                put(_Failure(e))
+            finally:
+                images.close()
+
+        producer = threading.Thread(target=produce, name="KeyframeStream", daemon=True)
+        producer.start()
+        try:
+            pending = {}
+            for idx in range(len(self.file_paths)):
+                while idx not in pending:
+                    item = results.get()
+                    if isinstance(item, _Failure):
+                        raise item.error
+                    pending[item[0]] = item[1]
+                yield pending.pop(idx)
+        finally:
+            # Also reached when the consumer stops early: release the producer and its pools
+            stop.set()
+            producer.join()
+
+
+class _Failure:
+    """
+    Exception raised by the producer, re-raised in the consumer.
+    """
+
+    def __init__(self, error):
+        self.error = error
@@ -0,0 +1,92 @@
+import threading
+import weakref
+from collections import OrderedDict
+
+import torch
+
+# Budgets, in bytes of cached tensors, of the caches kept between executions
+# Text encodes (one per CLIP model and prompt)
+TEXT_ENCODE_CACHE_BYTES = 512 * 1024 * 1024
+# Gray filler latents (one per length/size/VAE)
+FILLER_LATENT_CACHE_BYTES = 256 * 1024 * 1024
+# Per-segment concat latents
+SEGMENT_LATENT_CACHE_BYTES = 1024 * 1024 * 1024
+
+
+def value_nbytes(value):
+    """
+    Size in bytes of the tensors in a cached value, including tensors nested
+    in lists, tuples and dicts (such as conditioning and its pooled output).
+    """
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, dict):
+        return sum(value_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(value_nbytes(item) for item in value)
+    return 0
+
+
+class ModelKeyedCache:
+    """
+    LRU cache of results computed with a model (CLIP, VAE), keyed on the model
+    object and a hashable key, and bounded by a byte budget for the tensors
+    it holds. Values larger than the whole budget are not cached.
+
+    Entries hold a weak reference to the model, so a new model that happens
+    to reuse the id() of a freed one never gets stale results.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, model, key):
+        key = (id(model), key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            model_ref, value, nbytes = entry
+            if model_ref() is not model:
+                del self._entries[key]
+                self._bytes -= nbytes
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, model, key, value):
+        try:
+            model_ref = weakref.ref(model)
+        except TypeError:
+            # Not weak-referenceable: identity cannot be verified later, so do not cache
+            return
+        nbytes = value_nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        key = (id(model), key)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (model_ref, value, nbytes)
+            self._bytes += nbytes
+            # Evict least recently used entries until we are within budget
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+
+# Shared between executions so re-queued prompts skip the text encoder
+TEXT_ENCODE_CACHE = ModelKeyedCache(TEXT_ENCODE_CACHE_BYTES)
+# Shared between executions so the constant gray filler is VAE-encoded once
+FILLER_LATENT_CACHE = ModelKeyedCache(FILLER_LATENT_CACHE_BYTES)
+# Shared between executions so unchanged segments are not VAE-encoded again
+SEGMENT_LATENT_CACHE = ModelKeyedCache(SEGMENT_LATENT_CACHE_BYTES)
@@ -0,0 +1,113 @@
+import re
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+# Maximum number of compiled schedules kept between executions
+SCHEDULE_CACHE_ENTRIES = 64
+# "[2] prompt", "[2.5] prompt" or "[2->3] prompt" (positions may be fractional)
+LINE_PATTERN = re.compile(r"^\[(\d+(?:\.\d+)?)(?:\s*->\s*(\d+(?:\.\d+)?))?\]\s*(.+)$")
+
+# A prompt change at keyframe position start, fading in until end (end == start for a hard cut)
+# and held until hold_end, the next segment with its own "[N]" prompt (inf when there is none)
+PromptEvent = namedtuple("PromptEvent", ["start", "end", "hold_end", "prompt"])
+
+
+class PromptSchedule:
+    """
+    Compiled positive prompt of WanKeyframeToVideo.
+
+    "[N] prompt" lines set the prompt of segment N; segments without one use
+    the "[0]" prompt (or the first line). "[2.5] prompt" switches to a prompt
+    halfway through segment 2, "[2->3] prompt" fades it in linearly from
+    keyframe 2 to keyframe 3. Such changes are held by the following segments
+    until the next segment that has its own "[N]" line.
+
+    Segments are conditioned on one text embedding each, so timed changes are
+    resolved to per-segment prompt weights: the mix of prompts active at each
+    frame, averaged over the segment's frames. Within a segment the blend is
+    constant; a fade shows up as a step in the blend from segment to segment.
+    """
+
+    def __init__(self, segment_prompts, fallback, events):
+        self.segment_prompts = segment_prompts
+        self.fallback = fallback
+        self.events = events
+        self._weights = {}
+
+    def base_prompt(self, segment):
+        return self.segment_prompts.get(segment, self.fallback)
+
+    def segment_weights(self, segment, frames):
+        """
+        Prompt weights of a segment of the given number of frames, as a tuple of
+        (prompt, weight) pairs summing to 1. A segment without timed changes
+        gets its base prompt with weight 1.
+        """
+        key = (segment, frames)
+        weights = self._weights.get(key)
+        if weights is None:
+            events = [event for event in self.events if event.start < segment + 1 and event.hold_end > segment]
+            if not events:
+                weights = ((self.base_prompt(segment), 1.0),)
+            else:
+                totals = {}
+                for frame in range(frames):
+                    t = segment + frame / max(1, frames - 1)
+                    for prompt, weight in self._mix(segment, t, events).items():
+                        totals[prompt] = totals.get(prompt, 0.0) + weight
+                weights = tuple(
+                    (prompt, round(total / frames, 6)) for prompt, total in totals.items() if round(total / frames, 6) > 0
+                )
+            self._weights[key] = weights
+        return weights
+
+    def _mix(self, segment, t, events):
+        """
+        Prompt weights at keyframe position t: the segment's base prompt, blended
+        toward every change that has started by t, in order.
+        """
+        mix = {self.base_prompt(segment): 1.0}
+        for event in events:
+            if t < event.start:
+                break
+            weight = 1.0 if t >= event.end else (t - event.start) / (event.end - event.start)
+            mix = {prompt: value * (1.0 - weight) for prompt, value in mix.items()}
+            mix[event.prompt] = mix.get(event.prompt, 0.0) + weight
+        return mix
+
+
+@lru_cache(maxsize=SCHEDULE_CACHE_ENTRIES)
+def compile_schedule(text):
+    """
+    Parse a positive prompt into a PromptSchedule. Compiled schedules are
+    cached by text, so re-queued prompts are not parsed again.
+    """
+    lines = [line.strip() for line in text.split('\n') if line.strip()]
+    if len(lines) == 0:
+        lines = [text]
+
+    segment_prompts = {}
+    changes = []
+    for line in lines:
+        match = LINE_PATTERN.match(line)
+        if not match:
+            continue
+        start, end, prompt = match.group(1), match.group(2), match.group(3).strip()
+        if end is None and "." not in start:
+            segment_prompts[int(start)] = prompt
+            continue
+        start = float(start)
+        end = start if end is None else float(end)
+        if end < start:
+            raise ValueError(f"Invalid prompt transition '{line[:line.index(']') + 1]}', the end must not precede the start")
+        changes.append((start, end, prompt))
+
+    # Hold each change until a later segment sets its own prompt
+    own_segments = sorted(segment_prompts)
+    events = []
+    for start, end, prompt in sorted(changes, key=lambda change: change[0]):
+        hold_end = next((segment for segment in own_segments if segment >= end and segment > start), math.inf)
+        events.append(PromptEvent(start, end, hold_end, prompt))
+    fallback = segment_prompts.get(0, lines[0])
+    return PromptSchedule(segment_prompts, fallback, tuple(events))
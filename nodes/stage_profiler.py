@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+
+import torch
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_MB = 1024 * 1024
+
+
+def rss_bytes():
+    """
+    Current resident set size, or None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def reset_peak_rss():
+    """
+    Reset the process high-water mark (Linux only). Returns True on success.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """
+    Resident set size high-water mark: since the last reset on Linux,
+    since process start elsewhere. None on Windows.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kilobytes elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _cuda_active():
+    return torch.cuda.is_available() and torch.cuda.is_initialized()
+
+
+class StageProfiler:
+    """
+    Opt-in wall time and memory instrumentation for the stages of a node.
+
+    A stage may be entered many times; calls, wall time and peaks accumulate per
+    stage. Memory is reported as the RSS peak during the stage (Linux; the
+    process peak elsewhere) and, when CUDA is in use, the peak allocated CUDA
+    memory. Stages must not be nested. A disabled profiler costs one attribute
+    check per stage.
+    """
+
+    def __init__(self, node, enabled=True, **context):
+        self.node = node
+        self.enabled = enabled
+        self.context = context
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def stage(self, name):
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name):
+        per_stage_peak = reset_peak_rss()
+        cuda = _cuda_active()
+        if cuda:
+            torch.cuda.reset_peak_memory_stats()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = peak_rss_bytes()
+            cuda_peak = torch.cuda.max_memory_allocated() if cuda else None
+            self._record(name, seconds, peak, per_stage_peak, cuda_peak)
+
+    def _record(self, name, seconds, peak, per_stage_peak, cuda_peak):
+        with self._lock:
+            entry = self._stages.setdefault(name, {
+                "calls": 0, "seconds": 0.0, "peak_rss": None, "per_stage_peak": True, "cuda_peak": None,
+            })
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["per_stage_peak"] = entry["per_stage_peak"] and per_stage_peak
+            if peak is not None:
+                entry["peak_rss"] = max(entry["peak_rss"] or 0, peak)
+            if cuda_peak is not None:
+                entry["cuda_peak"] = max(entry["cuda_peak"] or 0, cuda_peak)
+
+    def note(self, **values):
+        """
+        Add values (image count, sizes, ...) to the "total" record.
+        """
+        if self.enabled:
+            self.context.update(values)
+
+    def iterate(self, name, iterable):
+        """
+        Iterate over iterable, timing every step (the time spent producing each
+        item, not the caller's work on it) as stage name.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def records(self):
+        """
+        One dict per stage in first-entered order, followed by a "total" record.
+        """
+        records = []
+        with self._lock:
+            stages = list(self._stages.items())
+        for name, entry in stages:
+            record = {"node": self.node, "stage": name, "calls": entry["calls"], "seconds": round(entry["seconds"], 6)}
+            if entry["peak_rss"] is not None:
+                key = "peak_rss_mb" if entry["per_stage_peak"] else "process_peak_rss_mb"
+                record[key] = round(entry["peak_rss"] / _MB, 1)
+            if entry["cuda_peak"] is not None:
+                record["cuda_peak_mb"] = round(entry["cuda_peak"] / _MB, 1)
+            records.append(record)
+
+        total = {"node": self.node, "stage": "total", "seconds": round(time.perf_counter() - self._started, 6)}
+        rss = rss_bytes()
+        if rss is not None:
+            total["rss_mb"] = round(rss / _MB, 1)
+        total.update(self.context)
+        records.append(total)
+        return records
+
+    def emit(self):
+        """
+        Print the records as JSON lines and return them as one string.
+        Returns an empty string when disabled.
+        """
+        if not self.enabled:
+            return ""
+        text = "\n".join(json.dumps(record) for record in self.records())
+        print(text)
+        return text
+
+
+_DONE = object()
+
+# Shared disabled instance for callers that do not profile
+NULL_PROFILER = StageProfiler(None, enabled=False)
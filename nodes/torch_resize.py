@@ -0,0 +1,83 @@
+import torch
+import torch.nn.functional as F
+
+# Number of same-size source images resized together in one tensor operation
+RESIZE_CHUNK = 16
+# Sources larger than this many times the output are pre-shrunk with antialiased
+# bilinear before the Lanczos pass (the tensor counterpart of PIL's reducing_gap)
+LANCZOS_REDUCING_GAP = 2.0
+
+
+def _lanczos3(x):
+    x = x.abs()
+    out = torch.sinc(x) * torch.sinc(x / 3.0)
+    return torch.where(x < 3.0, out, torch.zeros_like(out))
+
+
+def lanczos_weights(in_size, out_size, dtype=torch.float32):
+    """
+    Dense (out_size, in_size) Lanczos-3 resampling matrix. When downscaling, the
+    kernel is widened by the scale factor (antialiasing), as PIL does.
+    """
+    scale = in_size / out_size
+    support = 3.0 * max(scale, 1.0)
+    centers = (torch.arange(out_size, dtype=torch.float64) + 0.5) * scale
+    taps = torch.arange(in_size, dtype=torch.float64) + 0.5
+    distance = (taps[None, :] - centers[:, None]) / max(scale, 1.0)
+    weights = _lanczos3(distance)
+    weights = torch.where(distance.abs() * max(scale, 1.0) < support, weights, torch.zeros_like(weights))
+    weights = weights / weights.sum(dim=1, keepdim=True).clamp_min(1e-12)
+    return weights.to(dtype)
+
+
+def resize_tensor(images, width, height, kernel="lanczos"):
+    """
+    Resize a batch shaped [B, C, H, W] to [B, C, height, width].
+    kernel is "bilinear" or "bicubic" (antialiased torch interpolation, run
+    directly on uint8 channels-last input when given uint8) or "lanczos"
+    (separable Lanczos-3 applied as two matrix products, returns float; large
+    reductions are first pre-shrunk to LANCZOS_REDUCING_GAP times the output).
+    """
+    if images.shape[-2:] == (height, width):
+        return images
+    if kernel in ("bilinear", "bicubic"):
+        return F.interpolate(images, size=(height, width), mode=kernel, align_corners=False, antialias=True)
+
+    reduced_height = min(images.shape[-2], int(height * LANCZOS_REDUCING_GAP))
+    reduced_width = min(images.shape[-1], int(width * LANCZOS_REDUCING_GAP))
+    if (reduced_height, reduced_width) != tuple(images.shape[-2:]):
+        images = F.interpolate(
+            images, size=(reduced_height, reduced_width), mode="bilinear", align_corners=False, antialias=True
+        )
+
+    images = images.to(torch.float32)
+    weights_y = lanczos_weights(images.shape[-2], height, images.dtype)
+    weights_x = lanczos_weights(images.shape[-1], width, images.dtype)
+    # Resample the axis that shrinks most first to keep the intermediate small
+    if height / images.shape[-2] <= width / images.shape[-1]:
+        return torch.matmul(torch.matmul(weights_y, images), weights_x.T)
+    return torch.matmul(weights_y, torch.matmul(images, weights_x.T))
+
+
+def fit_size(source_width, source_height, target_width, target_height):
+    """
+    Size of an image fitted inside the target while keeping its aspect ratio.
+    Like PIL's thumbnail(), images that already fit are never enlarged.
+    """
+    if source_width <= target_width and source_height <= target_height:
+        return source_width, source_height
+    scale = min(target_width / source_width, target_height / source_height)
+    return (
+        max(1, min(target_width, round(source_width * scale))),
+        max(1, min(target_height, round(source_height * scale))),
+    )
+
+
+def to_uint8(images):
+    """
+    Round and clamp a [B, C, H, W] batch in 0..255 to uint8 [B, H, W, C].
+    """
+    if images.dtype != torch.uint8:
+        images = images.round().clamp_(0, 255).to(torch.uint8)
+    return images.movedim(1, -1).contiguous()
+
@@ -0,0 +1,26 @@
+"""
+The tests run without ComfyUI, on the stub modules of benchmarks/stubs.py.
+They are installed when this file is loaded, before pytest imports the
+extension's __init__.py as the package containing the tests.
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+import stubs  # noqa: E402
+
+INPUT_DIRECTORY = tempfile.mkdtemp(prefix="wankeyframing-tests-")
+stubs.install_stubs(INPUT_DIRECTORY)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(INPUT_DIRECTORY, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def package():
+    return stubs.load_package()
@@ -0,0 +1,84 @@
+"""
+Behavior of prompt schedules: per-segment prompt weights of "[N]", "[N.5]" and
+"[N->M]" lines, and the conditioning WanKeyframeToVideo builds from them.
+"""
+import pytest
+import torch
+
+import stubs
+
+FRAMES = 17
+
+
+@pytest.fixture
+def compile_schedule(package):
+    return package.nodes.prompt_schedule.compile_schedule
+
+
+def weights(schedule, segments):
+    return [dict(schedule.segment_weights(segment, FRAMES)) for segment in range(segments)]
+
+
+def test_indexed_prompts_use_segment_or_fallback(compile_schedule):
+    schedule = compile_schedule("[0] a\n[2] c")
+    assert weights(schedule, 4) == [{"a": 1.0}, {"a": 1.0}, {"c": 1.0}, {"a": 1.0}]
+    assert weights(compile_schedule("plain prompt"), 2) == [{"plain prompt": 1.0}] * 2
+
+
+def test_cut_blends_segment_and_is_held_until_next_indexed_prompt(compile_schedule):
+    schedule = compile_schedule("[0] a\n[1.5] b\n[3] c")
+    segments = weights(schedule, 5)
+    assert segments[0] == {"a": 1.0}
+    assert segments[1]["a"] == pytest.approx(8 / 17, abs=1e-6)
+    assert segments[1]["b"] == pytest.approx(9 / 17, abs=1e-6)
+    assert segments[2] == {"b": 1.0}
+    assert segments[3] == {"c": 1.0}
+    assert segments[4] == {"a": 1.0}
+
+
+def test_fade_reaches_its_target_in_the_following_segment(compile_schedule):
+    segments = weights(compile_schedule("[0] a\n[1] b\n[1->2] s"), 4)
+    assert segments[1] == pytest.approx({"b": 0.5, "s": 0.5})
+    assert segments[2] == {"s": 1.0}
+    assert segments[3] == {"s": 1.0}
+
+
+def test_fade_over_several_segments_steps_per_segment(compile_schedule):
+    segments = weights(compile_schedule("[0] a\n[1->3] f\n[4] d"), 5)
+    assert segments[1] == pytest.approx({"a": 0.75, "f": 0.25})
+    assert segments[2] == pytest.approx({"a": 0.25, "f": 0.75})
+    assert segments[3] == {"f": 1.0}
+    assert segments[4] == {"d": 1.0}
+
+
+def test_fade_ending_on_indexed_segment_hands_over(compile_schedule):
+    segments = weights(compile_schedule("[0] a\n[1->2] s\n[2] c"), 3)
+    assert segments[1] == pytest.approx({"a": 0.5, "s": 0.5})
+    assert segments[2] == {"c": 1.0}
+
+
+def test_transition_end_before_start_is_rejected(compile_schedule):
+    with pytest.raises(ValueError):
+        compile_schedule("[0] a\n[3->2] b")
+
+
+def test_encoder_conditions_segments_on_weighted_embeddings(package):
+    encoder = package.nodes.WanKeyframeToVideo.WanKeyframeToVideo()
+    clip = stubs.StubCLIP(tokens=8, dim=16, pooled_dim=16)
+    keyframes = torch.rand(5, 32, 32, 3, generator=torch.Generator().manual_seed(0))
+    positive, _, _ = encoder.encode(
+        clip, "[0] a\n[1] b\n[1->2] s\n[3] c", "negative", stubs.StubVAE(), 32, 32, 16, 1,
+        keyframes=keyframes, reuse_segments=False,
+    )[:3]
+
+    embeddings = positive[0][0]
+    pooled = positive[0][1]["pooled_output"]
+    encoded = {
+        prompt: stubs.StubCLIPTextEncode().encode(clip, prompt)[0][0] for prompt in ("a", "b", "s", "c")
+    }
+    assert embeddings.shape[0] == 4
+    assert torch.equal(embeddings[0], encoded["a"][0][0])
+    assert torch.allclose(embeddings[1], 0.5 * encoded["b"][0][0] + 0.5 * encoded["s"][0][0])
+    assert torch.allclose(pooled[1], 0.5 * encoded["b"][1]["pooled_output"][0] + 0.5 * encoded["s"][1]["pooled_output"][0])
+    assert torch.equal(embeddings[2], encoded["s"][0][0])
+    assert torch.equal(embeddings[3], encoded["c"][0][0])